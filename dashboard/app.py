@@ -23,6 +23,14 @@ def dashboard():
     )
 
 
+@app.teardown_appcontext
+def close_db_connection(exception):
+    """Closes the request thread's database connection."""
+    facade = app.config.get("FACADE")
+    if facade is not None:
+        facade.close()
+
+
 def run_dashboard(facade: WasteManagementFacade):
     """Runs the Flask development server."""
     app.config["FACADE"] = facade
@@ -17,9 +17,11 @@ def initialize_app():
     """
     Initializes the application by setting up log database and the logging.
     """
-    with PersistenceService() as persistence_service:
+    persistence_service = PersistenceService()
+    with persistence_service:
         persistence_service.init_db()
-    
+    persistence_service.close()
+
     setup_database_logging()
 
 
@@ -2,12 +2,21 @@
 This module sets up a database logging handler for the application.
 """
 
+import atexit
 import logging
+import queue
 import sqlite3
 from logging import Handler, LogRecord
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
 
 from schedule_parser.config import WASTE_SCHEDULE_DB_PATH
 
+# Delivers queued records to the handlers on a background thread
+_listener: Optional[QueueListener] = None
+# Whether stop_database_logging is already registered to run at exit
+_stop_registered = False
+
 
 class SQLiteHandler(Handler):
     """
@@ -36,10 +45,16 @@ class SQLiteHandler(Handler):
             print(f"CRITICAL: Could not write log to database: {e}")
 
 
-def setup_database_logging() -> None:
+def setup_database_logging(db_path: str = WASTE_SCHEDULE_DB_PATH) -> None:
     """
     Configures the root logger to use the SQLiteHandler.
+
+    Writing a record to the database takes a connection and a commit, so the
+    handlers run on a background thread; logging calls, including those made
+    on the bot's event loop, only put the record on a queue.
     """
+    global _listener, _stop_registered
+
     # Get the root logger
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)  # Set the lowest level to capture
@@ -47,20 +62,39 @@ def setup_database_logging() -> None:
     # Remove any existing handlers to avoid duplicates
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
+    stop_database_logging()
 
-    # Create and add the database handler
-    db_handler = SQLiteHandler()
+    # Create the database handler
+    db_handler = SQLiteHandler(db_path)
     db_handler.setLevel(logging.INFO)
     formatter = logging.Formatter(
         "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     )
     db_handler.setFormatter(formatter)
-    logger.addHandler(db_handler)
 
     # Add a console handler as well for immediate feedback
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(
+        log_queue, db_handler, console_handler, respect_handler_level=True
+    )
+    _listener.start()
+    if not _stop_registered:
+        atexit.register(stop_database_logging)
+        _stop_registered = True
+    logger.addHandler(QueueHandler(log_queue))
 
     logging.info("Logging configured to use database and console.")
+
+
+def stop_database_logging() -> None:
+    """
+    Writes out any records still queued and stops the background thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -30,11 +30,52 @@ ICAL_API_URL = os.environ.get(
     "https://stadtplan.dresden.de/project/cardo3Apps/IDU_DDStadtplan/abfall/ical.ashx",
 )
 
-# Telegram bot rate limiting
+# Telegram bot rate limiting: messages per second overall, messages per
+# minute to each group chat, and commands per second accepted from each chat
 TELEGRAM_RATE_LIMIT_OVERALL = int(os.environ.get("TELEGRAM_RATE_LIMIT_OVERALL", 30))
-TELEGRAM_RATE_LIMIT_GROUP = float(os.environ.get("TELEGRAM_RATE_LIMIT_GROUP", 20 / 60))
-TELEGRAM_RATE_LIMIT_PER_CHAT = int(os.environ.get("TELEGRAM_RATE_LIMIT_PER_CHAT", 1))
+# TELEGRAM_RATE_LIMIT_GROUP is the older per-second group setting (default
+# 20 / 60); if it is set and the per-minute one is not, it is converted.
+_LEGACY_RATE_LIMIT_GROUP = os.environ.get("TELEGRAM_RATE_LIMIT_GROUP")
+TELEGRAM_RATE_LIMIT_GROUP_PER_MINUTE = int(
+    os.environ.get(
+        "TELEGRAM_RATE_LIMIT_GROUP_PER_MINUTE",
+        max(1, round(float(_LEGACY_RATE_LIMIT_GROUP) * 60))
+        if _LEGACY_RATE_LIMIT_GROUP
+        else 20,
+    )
+)
+TELEGRAM_RATE_LIMIT_PER_CHAT = int(os.environ.get("TELEGRAM_RATE_LIMIT_PER_CHAT", 3))
+# Notification sends per second, kept slightly below the overall limit so
+# interactive replies still get through while notifications go out.
+NOTIFICATION_SEND_RATE = int(os.environ.get("NOTIFICATION_SEND_RATE", 28))
+# Concurrent notification sends, and how many outcomes are written to the
+# database per transaction while the remaining sends continue.
+NOTIFICATION_SEND_WORKERS = int(os.environ.get("NOTIFICATION_SEND_WORKERS", 8))
+NOTIFICATION_LOG_BATCH_SIZE = int(os.environ.get("NOTIFICATION_LOG_BATCH_SIZE", 50))
+# Seconds between catch-up passes outside the notification windows. Each pass
+# retries failed sends and picks up subscriptions created after their window.
+NOTIFICATION_CATCH_UP_INTERVAL = int(
+    os.environ.get("NOTIFICATION_CATCH_UP_INTERVAL", 3600)
+)
+
+# Local hours at which notifications go out: morning subscribers are told
+# about the day's collections, evening subscribers about the next day's.
+MORNING_NOTIFICATION_HOUR = 6
+EVENING_NOTIFICATION_HOUR = 19
+
+# File for the bot's conversation state, so that subscriptions in progress
+# survive a restart. Disabled if unset.
+BOT_PERSISTENCE_PATH = os.environ.get("BOT_PERSISTENCE_PATH")
+
+# Locations whose schedules are downloaded at the same time during updates
+SCHEDULE_DOWNLOAD_WORKERS = int(os.environ.get("SCHEDULE_DOWNLOAD_WORKERS", 4))
 
 # Schedule service retry settings
 SCHEDULE_SERVICE_MAX_RETRIES = int(os.environ.get("SCHEDULE_SERVICE_MAX_RETRIES", 3))
 SCHEDULE_SERVICE_RETRY_DELAY = int(os.environ.get("SCHEDULE_SERVICE_RETRY_DELAY", 10))
+
+# Cache settings
+LOCATION_CACHE_TTL_SECONDS = int(os.environ.get("LOCATION_CACHE_TTL_SECONDS", 6 * 60 * 60))
+LOCATION_CACHE_MAXSIZE = int(os.environ.get("LOCATION_CACHE_MAXSIZE", 2048))
+SUBSCRIPTION_CACHE_TTL_SECONDS = int(os.environ.get("SUBSCRIPTION_CACHE_TTL_SECONDS", 30))
+SUBSCRIPTION_CACHE_MAXSIZE = int(os.environ.get("SUBSCRIPTION_CACHE_MAXSIZE", 4096))
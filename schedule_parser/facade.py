@@ -6,6 +6,9 @@ import logging
 from datetime import date
 from typing import List, Optional
 
+from .cache import TTLCache
+from .config import (LOCATION_CACHE_MAXSIZE, LOCATION_CACHE_TTL_SECONDS,
+                     SUBSCRIPTION_CACHE_MAXSIZE, SUBSCRIPTION_CACHE_TTL_SECONDS)
 from .exceptions import DownloadError, ParsingError
 from .services.notification_service import NotificationService
 from .services.persistence_service import PersistenceService
@@ -35,6 +38,16 @@ class WasteManagementFacade:
         self.subscription_service = subscription_service
         self.notification_service = notification_service
         self.smart_schedule_service = smart_schedule_service
+        # Verified location IDs rarely change, and users often re-enter the same
+        # ID, so successful verifications are kept to avoid repeated downloads.
+        self._verified_locations = TTLCache(
+            maxsize=LOCATION_CACHE_MAXSIZE, ttl=LOCATION_CACHE_TTL_SECONDS
+        )
+        # Users tend to run several menu commands in a row, so each chat's
+        # subscription list is kept briefly and dropped when it changes.
+        self._subscriptions_by_chat = TTLCache(
+            maxsize=SUBSCRIPTION_CACHE_MAXSIZE, ttl=SUBSCRIPTION_CACHE_TTL_SECONDS
+        )
 
     def subscribe_address_for_user(
         self, chat_id: int, address_id: int, address_name: str, notification_time: str
@@ -103,6 +116,7 @@ class WasteManagementFacade:
                 address_name=address_name,
                 notification_time=notification_time,
             )
+            self._subscriptions_by_chat.pop(chat_id)
 
             logger.info(
                 f"Successfully subscribed chat_id {chat_id} to ID {address_id} ('{address_name}')."
@@ -126,6 +140,18 @@ class WasteManagementFacade:
         """
         Verifies if a location ID is valid and returns the address name found in the schedule.
         """
+        cached = self._verified_locations.get(location_id)
+        if cached is not None:
+            return cached
+
+        address = self._verify_location_id_uncached(location_id)
+        # Only successful lookups are cached; failures may be transient.
+        if address:
+            self._verified_locations.set(location_id, address)
+        return address
+
+    def _verify_location_id_uncached(self, location_id: int) -> Optional[str]:
+        """Looks up a location's address in the database, downloading it if missing."""
         # First, try to find the address name in our database to avoid unnecessary downloads
         try:
             with self.persistence_service as p:
@@ -148,10 +174,41 @@ class WasteManagementFacade:
             logger.exception(f"Failed to get subscriptions for chat_id {chat_id}: {e}")
             return []
 
-    def unsubscribe(self, subscription_id: int) -> bool:
-        """Unsubscribes a user from a specific subscription."""
+    def get_user_subscriptions_with_names(self, chat_id: int) -> List[dict]:
+        """Retrieves a user's active subscriptions with resolved address names."""
+        # The cache holds a tuple and every caller gets its own list, so a
+        # caller that changes the list does not change the cached entry.
+        cached = self._subscriptions_by_chat.get(chat_id)
+        if cached is not None:
+            return list(cached)
         try:
-            self.subscription_service.remove_subscription(subscription_id)
+            subscriptions = self.subscription_service.get_user_subscriptions_with_names(
+                chat_id
+            )
+        except Exception as e:
+            logger.exception(f"Failed to get subscriptions for chat_id {chat_id}: {e}")
+            return []
+        self._subscriptions_by_chat.set(chat_id, tuple(subscriptions))
+        return list(subscriptions)
+
+    def unsubscribe(self, subscription_id: int, chat_id: Optional[int] = None) -> bool:
+        """
+        Unsubscribes a user from a specific subscription. If chat_id is given,
+        only a subscription owned by that chat can be removed.
+        """
+        try:
+            removed = self.subscription_service.remove_subscription(
+                subscription_id, chat_id
+            )
+            if not removed:
+                logger.warning(
+                    f"No active subscription {subscription_id} found for chat_id {chat_id}."
+                )
+                return False
+            if chat_id is None:
+                self._subscriptions_by_chat.clear()
+            else:
+                self._subscriptions_by_chat.pop(chat_id)
             logger.info(f"Successfully unsubscribed subscription_id {subscription_id}.")
             return True
         except Exception as e:
@@ -190,12 +247,21 @@ class WasteManagementFacade:
                 "error": str(e),
             }
 
+    def close(self) -> None:
+        """Closes the calling thread's database connection."""
+        self.persistence_service.close()
+
     # --- Notification Cycle Methods ---
 
-    def get_due_notifications(self) -> List[dict]:
-        """Gets all notifications that are due to be sent."""
+    def get_due_notifications(
+        self, notification_time: Optional[str] = None
+    ) -> List[dict]:
+        """
+        Gets all notifications that are due to be sent, optionally only those
+        for one notification time ('morning' or 'evening').
+        """
         try:
-            return self.notification_service.get_due_notifications()
+            return self.notification_service.get_due_notifications(notification_time)
         except Exception:
             logger.exception("Failed to get due notifications.")
             return []
@@ -221,6 +287,28 @@ class WasteManagementFacade:
         except Exception:
             logger.exception(f"Failed to update notification log for log_id {log_id}.")
 
+    def log_pending_notifications(self, subscription_ids: List[int]) -> List[int]:
+        """
+        Logs a batch of notifications that are about to be sent and returns
+        their log IDs in order, or an empty list if logging failed.
+        """
+        try:
+            return self.notification_service.log_pending_notifications(
+                subscription_ids
+            )
+        except Exception:
+            logger.exception(
+                f"Failed to log {len(subscription_ids)} pending notifications."
+            )
+            return []
+
+    def finalize_notifications(self, outcomes: List[dict]) -> None:
+        """Records the outcomes of a batch of sent notifications."""
+        try:
+            self.notification_service.finalize_notifications(outcomes)
+        except Exception:
+            logger.exception(f"Failed to record {len(outcomes)} notification outcomes.")
+
     def update_last_notified_date(
         self, subscription_id: int, collection_date: date
     ) -> None:
@@ -236,20 +324,17 @@ class WasteManagementFacade:
 
     def get_next_pickup_for_user(self, chat_id: int) -> List[dict]:
         """Gets the next pickup for each of a user's subscriptions."""
-        subscriptions = self.get_user_subscriptions(chat_id)
-        if not subscriptions:
+        today = date.today().isoformat()
+        try:
+            with self.persistence_service as p:
+                rows = p.get_next_pickups_by_chat_id(chat_id, today)
+        except Exception as e:
+            logger.exception(f"Failed to get next pickups for chat_id {chat_id}: {e}")
             return []
 
-        today = date.today().isoformat()
         next_pickups = []
-
-        with self.persistence_service as p:
-            for sub in subscriptions:
-                event = p.get_next_waste_event_for_subscription(
-                    sub["address_id"], today
-                )
-                if event:
-                    # Use the name the user gave, or fallback to something else
-                    address = sub["address_name"] or self.get_address_by_id(sub["address_id"])
-                    next_pickups.append({"address": address, "event": event})
+        for row in rows:
+            event = dict(row)
+            address = event.pop("address")
+            next_pickups.append({"address": address, "event": event})
         return next_pickups
@@ -20,9 +20,20 @@ class WasteEvent:
     address_id: int
 
     def compute_hash(self) -> str:
-        """Compute SHA256 hash ignoring UID."""
+        """Compute a 128-bit BLAKE2b hash ignoring UID."""
         # Note: address_id is part of the identity of the event source,
         # but the hash is for deduplication of the event CONTENT.
         # If the same event content comes from the same address ID, it's the same.
         raw = f"{self.date}|{self.location}|{self.waste_type}|{self.contact_name}|{self.contact_phone}|{self.original_address}|{self.address_id}"
-        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+@dataclass(slots=True)
+class NotificationTask:
+    """A notification that is due to be sent."""
+
+    subscription_id: int
+    chat_id: int
+    message: str
+    # The collection date as stored, an ISO 8601 string
+    collection_date: str
@@ -2,9 +2,12 @@
 This module defines the NotificationService for handling notifications.
 """
 
-from datetime import date, datetime, timedelta
-from typing import Any, Dict, List
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
 
+from ..config import EVENING_NOTIFICATION_HOUR, MORNING_NOTIFICATION_HOUR
+from ..models import NotificationTask
+from ..waste_types import get_waste_type_emoji
 from .persistence_service import PersistenceService
 
 
@@ -14,101 +17,60 @@ class NotificationService:
     def __init__(self, persistence_service: PersistenceService):
         self.persistence = persistence_service
 
-    def get_due_notifications(self) -> List[Dict[str, Any]]:
+    def get_due_notifications(
+        self, notification_time: Optional[str] = None
+    ) -> List[NotificationTask]:
         """
         Gathers all notifications that are due to be sent.
 
+        Args:
+            notification_time: If 'morning' or 'evening', only subscribers with
+                that preference are considered; otherwise both are.
+
         Returns:
-            A list of dictionaries, where each dictionary represents a notification task.
+            A list of NotificationTask objects, one per notification to send.
         """
-        with self.persistence as p:
-            subscriptions = p.get_all_active_subscriptions()
-            all_events = p.get_all_waste_events()  # Assuming this method exists
-
-        events_by_address = {}
-        for event in all_events:
-            address = event["original_address"]
-            if address not in events_by_address:
-                events_by_address[address] = []
-            events_by_address[address].append(event)
-
-        notification_tasks = []
         now = datetime.now()
         today = now.date()
         tomorrow = today + timedelta(days=1)
 
-        for sub in subscriptions:
-            address = self._get_address_for_subscription(
-                sub
-            )  # Helper to get address string
-            if not address:
-                continue
-
-            collections = events_by_address.get(address, [])
-            last_notified = (
-                date.fromisoformat(sub["last_notified"])
-                if sub["last_notified"]
-                else None
-            )
-
-            for collection in collections:
-                collection_date = date.fromisoformat(collection["date"])
-                waste_type = collection["waste_type"]
-
-                if last_notified == collection_date:
-                    continue
-
-                message = None
-                notification_time = sub["notification_time"]
-
-                # Evening before notification
-                if (
-                    notification_time == "evening"
-                    and collection_date == tomorrow
-                    and now.hour >= 19
-                ):
-                    emoji = self._get_waste_type_emoji(waste_type)
-                    message = f"{emoji} {waste_type} ist für morgen geplant!"
-
-                # Morning of notification
-                elif (
-                    notification_time == "morning"
-                    and collection_date == today
-                    and now.hour >= 6
-                ):
-                    emoji = self._get_waste_type_emoji(waste_type)
-                    message = f"{emoji} {waste_type} wird heute abgeholt!"
-
-                if message:
-                    notification_tasks.append(
-                        {
-                            "subscription_id": sub["id"],
-                            "chat_id": sub["chat_id"],
-                            "message": message,
-                            "collection_date": collection_date,
-                        }
-                    )
-        return notification_tasks
+        # Evening subscribers are told about tomorrow's collection from 19:00,
+        # morning subscribers about today's from 06:00. Which subscriptions
+        # match, and whether they were already notified, is decided in SQL.
+        evening_date = (
+            tomorrow.isoformat() if now.hour >= EVENING_NOTIFICATION_HOUR else None
+        )
+        morning_date = (
+            today.isoformat() if now.hour >= MORNING_NOTIFICATION_HOUR else None
+        )
+        if notification_time == "morning":
+            evening_date = None
+        elif notification_time == "evening":
+            morning_date = None
+        if evening_date is None and morning_date is None:
+            return []
 
-    def _get_address_for_subscription(self, subscription: Dict[str, Any]) -> str:
-        """Helper to get the address string for a subscription."""
-        # This is a placeholder. The actual implementation will depend on how
-        # addresses are stored and related to subscriptions.
         with self.persistence as p:
-            # Assuming a method to get address string by its ID
-            return p.get_address_by_id(subscription["address_id"])
-
-    def _get_waste_type_emoji(self, waste_type: str) -> str:
-        """Returns an emoji for a given waste type."""
-        if "bio" in waste_type.lower():
-            return "🟢"
-        if "papier" in waste_type.lower():
-            return "🔵"
-        if "gelbe" in waste_type.lower() or "verpackung" in waste_type.lower():
-            return "🟡"
-        if "rest" in waste_type.lower():
-            return "⚫"
-        return "🗑️"
+            pending = p.get_pending_notifications(evening_date, morning_date)
+
+        notification_tasks = []
+        for row in pending:
+            waste_type = row["waste_type"]
+            emoji = get_waste_type_emoji(waste_type)
+            if row["notification_time"] == "evening":
+                message = f"{emoji} {waste_type} ist für morgen geplant!"
+            else:
+                message = f"{emoji} {waste_type} wird heute abgeholt!"
+
+            notification_tasks.append(
+                NotificationTask(
+                    subscription_id=row["subscription_id"],
+                    chat_id=row["chat_id"],
+                    message=message,
+                    collection_date=row["date"],
+                )
+            )
+        return notification_tasks
 
     def log_pending_notification(self, subscription_id: int) -> int:
         """Logs a pending notification and returns the log ID."""
@@ -121,3 +83,25 @@ class NotificationService:
         """Updates the status of a notification log."""
         with self.persistence as p:
             p.update_notification_log_status(log_id, status, error_message)
+
+    def log_pending_notifications(self, subscription_ids: List[int]) -> List[int]:
+        """Logs a pending notification per subscription in one transaction."""
+        with self.persistence as p:
+            return p.create_pending_notification_logs(subscription_ids)
+
+    def finalize_notifications(self, outcomes: List[Dict[str, Any]]) -> None:
+        """
+        Records the result of each sent notification in one transaction: the log
+        status, and for delivered notifications the subscription's last
+        notified date.
+        """
+        log_statuses = [
+            (o["status"], o.get("error_message"), o["log_id"]) for o in outcomes
+        ]
+        last_notified = [
+            (o["collection_date"], o["subscription_id"])
+            for o in outcomes
+            if o["status"] == "success"
+        ]
+        with self.persistence as p:
+            p.finalize_notifications(log_statuses, last_notified)
@@ -3,32 +3,269 @@ This module defines the PersistenceService for database interactions.
 """
 
 import sqlite3
+import threading
 from typing import List, Optional
 
 from ..config import WASTE_SCHEDULE_DB_PATH
 from ..models import WasteEvent
 
+# Number of compiled statements kept per connection (sqlite3 default is 100).
+SQL_STATEMENT_CACHE_SIZE = 256
+
+# WAL lets the bot, scheduler and dashboard read while another connection writes.
+# The journal mode is stored in the database file, so it is set once in init_db.
+SQL_ENABLE_WAL = "PRAGMA journal_mode=WAL"
+# Per-connection settings applied on every connect. NORMAL is durable in WAL mode
+# and avoids an fsync per commit.
+SQL_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+# --- Schema ---
+
+SQL_CREATE_WASTE_EVENTS = """
+    CREATE TABLE IF NOT EXISTS waste_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        uid TEXT UNIQUE,
+        date TEXT,
+        location TEXT,
+        waste_type TEXT,
+        contact_name TEXT,
+        contact_phone TEXT,
+        hash TEXT,
+        original_address TEXT,
+        address_id INTEGER
+    )
+"""
+SQL_ADD_WASTE_EVENTS_ADDRESS_ID = "ALTER TABLE waste_events ADD COLUMN address_id INTEGER"
+SQL_CREATE_WASTE_EVENTS_ADDRESS_DATE_INDEX = "CREATE INDEX IF NOT EXISTS idx_waste_events_address_date ON waste_events(address_id, date)"
+SQL_CREATE_SUBSCRIPTIONS = """
+    CREATE TABLE IF NOT EXISTS subscriptions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        address_id INTEGER NOT NULL,
+        address_name TEXT,
+        notification_time TEXT NOT NULL,
+        last_notified DATE,
+        is_active BOOLEAN DEFAULT 1,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(chat_id, address_id)
+    )
+"""
+SQL_ADD_SUBSCRIPTIONS_ADDRESS_NAME = "ALTER TABLE subscriptions ADD COLUMN address_name TEXT"
+SQL_CREATE_LOGS = """
+    CREATE TABLE IF NOT EXISTS logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        level TEXT NOT NULL,
+        message TEXT NOT NULL,
+        logger_name TEXT
+    )
+"""
+SQL_CREATE_SYSTEM_INFO = """
+    CREATE TABLE IF NOT EXISTS system_info (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+"""
+SQL_CREATE_NOTIFICATION_LOGS = """
+    CREATE TABLE IF NOT EXISTS notification_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        subscription_id INTEGER,
+        timestamp_scheduled DATETIME DEFAULT CURRENT_TIMESTAMP,
+        timestamp_sent DATETIME,
+        status TEXT NOT NULL,
+        error_message TEXT,
+        FOREIGN KEY(subscription_id) REFERENCES subscriptions(id)
+    )
+"""
+
+# --- Waste events ---
+
+SQL_UPSERT_SELECT_HASH = "SELECT hash FROM waste_events WHERE uid = ?"
+SQL_UPSERT_UPDATE = "UPDATE waste_events SET date=?, location=?, waste_type=?, contact_name=?, contact_phone=?, hash=?, original_address=?, address_id=? WHERE uid=?"
+SQL_UPSERT_SELECT_BY_HASH = "SELECT uid FROM waste_events WHERE hash = ?"
+SQL_UPSERT_INSERT = "INSERT INTO waste_events (uid, date, location, waste_type, contact_name, contact_phone, hash, original_address, address_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+SQL_GET_ALL_WASTE_EVENTS = "SELECT * FROM waste_events"
+SQL_CHECK_EVENTS_EXISTENCE = "SELECT 1 FROM waste_events WHERE address_id = ? AND date BETWEEN ? AND ? LIMIT 1"
+SQL_GET_LOCATION_NAME_FROM_EVENTS = "SELECT location FROM waste_events WHERE address_id = ? AND location IS NOT NULL AND location != '' LIMIT 1"
+
+# --- Subscriptions ---
+
+SQL_FIND_SUBSCRIPTION = "SELECT * FROM subscriptions WHERE chat_id = ? AND address_id = ?"
+SQL_REACTIVATE_SUBSCRIPTION = "UPDATE subscriptions SET is_active = 1, address_name = ?, notification_time = ?, last_notified = NULL WHERE id = ?"
+SQL_CREATE_SUBSCRIPTION = "INSERT INTO subscriptions (chat_id, address_id, address_name, notification_time, last_notified) VALUES (?, ?, ?, ?, NULL)"
+SQL_GET_SUBSCRIPTIONS_BY_CHAT_ID = "SELECT id, address_id, address_name, notification_time FROM subscriptions WHERE chat_id = ? AND is_active = 1"
+# Resolves the display name of subscription 's' in SQL: its own name, the name
+# another subscriber gave the same address, or the 'Location <ID>' fallback.
+SQL_SUBSCRIPTION_DISPLAY_NAME = """
+    COALESCE(
+        s.address_name,
+        (SELECT o.address_name FROM subscriptions o
+         WHERE o.address_id = s.address_id AND o.address_name IS NOT NULL
+         LIMIT 1),
+        'Location ' || s.address_id
+    )
+"""
+SQL_GET_SUBSCRIPTIONS_WITH_NAMES_BY_CHAT_ID = f"""
+    SELECT s.id, s.address_id, s.address_name, s.notification_time,
+           {SQL_SUBSCRIPTION_DISPLAY_NAME} AS address
+    FROM subscriptions s
+    WHERE s.chat_id = ? AND s.is_active = 1
+"""
+# The earliest collection on or after the given date for each of a chat's active
+# subscriptions, in a single pass over the (address_id, date) index.
+SQL_GET_NEXT_PICKUPS_BY_CHAT_ID = f"""
+    WITH ranked AS (
+        SELECT s.id AS subscription_id,
+               {SQL_SUBSCRIPTION_DISPLAY_NAME} AS address,
+               w.*,
+               ROW_NUMBER() OVER (PARTITION BY s.id ORDER BY w.date) AS rn
+        FROM subscriptions s
+        JOIN waste_events w ON w.address_id = s.address_id
+        WHERE s.chat_id = ? AND s.is_active = 1 AND w.date >= ?
+    )
+    SELECT address, id, uid, date, location, waste_type, contact_name,
+           contact_phone, hash, original_address, address_id
+    FROM ranked
+    WHERE rn = 1
+    ORDER BY subscription_id
+"""
+SQL_DEACTIVATE_SUBSCRIPTION = "UPDATE subscriptions SET is_active = 0 WHERE id = ?"
+SQL_DEACTIVATE_CHAT_SUBSCRIPTION = "UPDATE subscriptions SET is_active = 0 WHERE id = ? AND chat_id = ?"
+SQL_GET_ALL_ACTIVE_SUBSCRIPTIONS = "SELECT id, chat_id, address_id, address_name, notification_time, last_notified FROM subscriptions WHERE is_active = 1"
+SQL_UPDATE_LAST_NOTIFIED = "UPDATE subscriptions SET last_notified = ? WHERE id = ?"
+SQL_GET_ADDRESS_BY_ID = "SELECT address_name FROM subscriptions WHERE address_id = ? AND address_name IS NOT NULL LIMIT 1"
+# One row per due notification: evening subscribers with a collection on the
+# first date, morning subscribers with one on the second, each not yet notified.
+# A NULL date matches nothing.
+SQL_GET_PENDING_NOTIFICATIONS = """
+    SELECT
+        s.id AS subscription_id,
+        s.chat_id,
+        s.notification_time,
+        w.date,
+        w.waste_type
+    FROM
+        subscriptions s
+        JOIN waste_events w ON w.address_id = s.address_id
+    WHERE
+        s.is_active = 1
+        AND (
+            (s.notification_time = 'evening' AND w.date = ?)
+            OR (s.notification_time = 'morning' AND w.date = ?)
+        )
+        AND (s.last_notified IS NULL OR s.last_notified <> w.date)
+"""
+# We pick one name for the address_id. Since we group by address_id, it returns one row per ID.
+SQL_GET_UNIQUE_SUBSCRIBED_LOCATIONS = """
+    SELECT DISTINCT
+        address_id,
+        address_name as address
+    FROM
+        subscriptions
+    WHERE
+        is_active = 1
+    GROUP BY address_id;
+"""
+
+# --- Logs & system info ---
+
+SQL_CREATE_NOTIFICATION_LOG = "INSERT INTO notification_logs (subscription_id, status) VALUES (?, ?)"
+SQL_UPDATE_NOTIFICATION_LOG_STATUS = "UPDATE notification_logs SET status = ?, error_message = ?, timestamp_sent = CURRENT_TIMESTAMP WHERE id = ?"
+SQL_CREATE_PENDING_NOTIFICATION_LOG = "INSERT INTO notification_logs (subscription_id, status) VALUES (?, 'pending') RETURNING id"
+# Limit to 100 to avoid overwhelming the dashboard
+SQL_GET_ALL_LOGS = "SELECT * FROM logs ORDER BY timestamp DESC LIMIT 100"
+SQL_RECORD_SYSTEM_INFO = "INSERT OR REPLACE INTO system_info (key, value) VALUES (?, ?)"
+
 
 class PersistenceService:
     """Handles all database interactions for the application."""
 
     def __init__(self, db_path: str = WASTE_SCHEDULE_DB_PATH):
         self.db_path = db_path
-        self._conn: Optional[sqlite3.Connection] = None
-        self._cursor: Optional[sqlite3.Cursor] = None
+        # Connection state is kept per thread, so one instance can be shared by
+        # bot handlers that run facade calls concurrently via asyncio.to_thread.
+        # Each thread opens its connection once and reuses it for every 'with'
+        # block instead of reconnecting (and re-reading the schema) each time.
+        self._local = threading.local()
+
+    @property
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        return getattr(self._local, "conn", None)
+
+    @_conn.setter
+    def _conn(self, conn: Optional[sqlite3.Connection]) -> None:
+        self._local.conn = conn
+
+    @property
+    def _cursor(self) -> Optional[sqlite3.Cursor]:
+        return getattr(self._local, "cursor", None)
+
+    @_cursor.setter
+    def _cursor(self, cursor: Optional[sqlite3.Cursor]) -> None:
+        self._local.cursor = cursor
+
+    @property
+    def _depth(self) -> int:
+        return getattr(self._local, "depth", 0)
+
+    @_depth.setter
+    def _depth(self, depth: int) -> None:
+        self._local.depth = depth
+
+    def _connect(self) -> sqlite3.Connection:
+        """Opens and configures a new database connection."""
+        conn = sqlite3.connect(self.db_path, cached_statements=SQL_STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        for pragma in SQL_CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
 
     def __enter__(self) -> "PersistenceService":
-        """Establishes the database connection."""
-        self._conn = sqlite3.connect(self.db_path)
-        self._conn.row_factory = sqlite3.Row
-        self._cursor = self._conn.cursor()
+        """Starts a unit of work on this thread's database connection."""
+        if self._conn is None:
+            self._conn = self._connect()
+        if self._depth == 0:
+            self._cursor = self._conn.cursor()
+        self._depth += 1
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
-        """Commits changes and closes the connection."""
-        if self._conn:
-            self._conn.commit()
+        """
+        Commits changes when the outermost 'with' block ends, or rolls them back
+        if the block raised or the commit failed.
+        """
+        self._depth -= 1
+        if self._depth > 0:
+            return
+        try:
+            if exc_type is not None:
+                self._conn.rollback()
+                return
+            try:
+                self._conn.commit()
+            except sqlite3.Error:
+                self._conn.rollback()
+                raise
+        finally:
+            # Closing the cursor also resets any unfinished read, so an idle
+            # connection does not hold a WAL snapshot.
+            self._cursor.close()
+            self._cursor = None
+
+    def close(self) -> None:
+        """
+        Closes this thread's database connection, if it has one. The next 'with'
+        block on this thread opens a new connection.
+        """
+        if self._depth > 0:
+            raise RuntimeError("Cannot close the connection inside a 'with' block.")
+        if self._conn is not None:
             self._conn.close()
+            self._conn = None
 
     def _get_cursor(self) -> sqlite3.Cursor:
         """Returns the cursor, ensuring the connection is open."""
@@ -39,94 +276,38 @@ class PersistenceService:
     def init_db(self) -> None:
         """Initialize SQLite schema if not exists."""
         cur = self._get_cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS waste_events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                uid TEXT UNIQUE,
-                date TEXT,
-                location TEXT,
-                waste_type TEXT,
-                contact_name TEXT,
-                contact_phone TEXT,
-                hash TEXT,
-                original_address TEXT,
-                address_id INTEGER
-            )
-        """
-        )
+        cur.execute(SQL_ENABLE_WAL)
+        cur.execute(SQL_CREATE_WASTE_EVENTS)
         # Attempt to add address_id column to waste_events if it doesn't exist
         try:
-            cur.execute("ALTER TABLE waste_events ADD COLUMN address_id INTEGER")
+            cur.execute(SQL_ADD_WASTE_EVENTS_ADDRESS_ID)
         except sqlite3.OperationalError:
             # Column likely already exists
             pass
+        cur.execute(SQL_CREATE_WASTE_EVENTS_ADDRESS_DATE_INDEX)
 
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS subscriptions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                chat_id INTEGER NOT NULL,
-                address_id INTEGER NOT NULL,
-                address_name TEXT,
-                notification_time TEXT NOT NULL,
-                last_notified DATE,
-                is_active BOOLEAN DEFAULT 1,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(chat_id, address_id)
-            )
-        """
-        )
+        cur.execute(SQL_CREATE_SUBSCRIPTIONS)
         # Attempt to add address_name column if it doesn't exist (migration for existing DBs)
         try:
-            cur.execute("ALTER TABLE subscriptions ADD COLUMN address_name TEXT")
+            cur.execute(SQL_ADD_SUBSCRIPTIONS_ADDRESS_NAME)
         except sqlite3.OperationalError:
             # Column likely already exists
             pass
 
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                level TEXT NOT NULL,
-                message TEXT NOT NULL,
-                logger_name TEXT
-            )
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS system_info (
-                key TEXT PRIMARY KEY,
-                value TEXT
-            )
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS notification_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                subscription_id INTEGER,
-                timestamp_scheduled DATETIME DEFAULT CURRENT_TIMESTAMP,
-                timestamp_sent DATETIME,
-                status TEXT NOT NULL,
-                error_message TEXT,
-                FOREIGN KEY(subscription_id) REFERENCES subscriptions(id)
-            )
-            """
-        )
+        cur.execute(SQL_CREATE_LOGS)
+        cur.execute(SQL_CREATE_SYSTEM_INFO)
+        cur.execute(SQL_CREATE_NOTIFICATION_LOGS)
 
     def upsert_event(self, event: WasteEvent) -> None:
         """Insert or update event following deduplication logic."""
         cur = self._get_cursor()
         event_hash = event.compute_hash()
-        cur.execute("SELECT hash FROM waste_events WHERE uid = ?", (event.uid,))
+        cur.execute(SQL_UPSERT_SELECT_HASH, (event.uid,))
         row = cur.fetchone()
         if row:
             if row[0] != event_hash:
                 cur.execute(
-                    "UPDATE waste_events SET date=?, location=?, waste_type=?, contact_name=?, contact_phone=?, hash=?, original_address=?, address_id=? WHERE uid=?",
+                    SQL_UPSERT_UPDATE,
                     (
                         event.date,
                         event.location,
@@ -140,10 +321,10 @@ class PersistenceService:
                     ),
                 )
         else:
-            cur.execute("SELECT uid FROM waste_events WHERE hash = ?", (event_hash,))
+            cur.execute(SQL_UPSERT_SELECT_BY_HASH, (event_hash,))
             if not cur.fetchone():
                 cur.execute(
-                    "INSERT INTO waste_events (uid, date, location, waste_type, contact_name, contact_phone, hash, original_address, address_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    SQL_UPSERT_INSERT,
                     (
                         event.uid,
                         event.date,
@@ -162,10 +343,7 @@ class PersistenceService:
     ) -> Optional[dict]:
         """Finds a subscription by chat_id and address_id."""
         cur = self._get_cursor()
-        cur.execute(
-            "SELECT * FROM subscriptions WHERE chat_id = ? AND address_id = ?",
-            (chat_id, address_id),
-        )
+        cur.execute(SQL_FIND_SUBSCRIPTION, (chat_id, address_id))
         return cur.fetchone()
 
     def reactivate_subscription(
@@ -174,7 +352,7 @@ class PersistenceService:
         """Reactivates an existing subscription."""
         cur = self._get_cursor()
         cur.execute(
-            "UPDATE subscriptions SET is_active = 1, address_name = ?, notification_time = ?, last_notified = NULL WHERE id = ?",
+            SQL_REACTIVATE_SUBSCRIPTION,
             (address_name, notification_time, subscription_id),
         )
 
@@ -184,32 +362,46 @@ class PersistenceService:
         """Creates a new subscription."""
         cur = self._get_cursor()
         cur.execute(
-            "INSERT INTO subscriptions (chat_id, address_id, address_name, notification_time, last_notified) VALUES (?, ?, ?, ?, NULL)",
+            SQL_CREATE_SUBSCRIPTION,
             (chat_id, address_id, address_name, notification_time),
         )
 
     def get_subscriptions_by_chat_id(self, chat_id: int) -> List[dict]:
         """Retrieves all active subscriptions for a given chat_id."""
         cur = self._get_cursor()
-        cur.execute(
-            "SELECT id, address_id, address_name, notification_time FROM subscriptions WHERE chat_id = ? AND is_active = 1",
-            (chat_id,),
-        )
+        cur.execute(SQL_GET_SUBSCRIPTIONS_BY_CHAT_ID, (chat_id,))
         return cur.fetchall()
 
-    def deactivate_subscription(self, subscription_id: int) -> None:
-        """Marks a subscription as inactive."""
+    def get_subscriptions_with_names_by_chat_id(self, chat_id: int) -> List[dict]:
+        """
+        Retrieves all active subscriptions for a given chat_id, with the display
+        name already resolved in the 'address' column.
+        """
         cur = self._get_cursor()
-        cur.execute(
-            "UPDATE subscriptions SET is_active = 0 WHERE id = ?", (subscription_id,)
-        )
+        cur.execute(SQL_GET_SUBSCRIPTIONS_WITH_NAMES_BY_CHAT_ID, (chat_id,))
+        return cur.fetchall()
+
+    def deactivate_subscription(
+        self, subscription_id: int, chat_id: Optional[int] = None
+    ) -> bool:
+        """
+        Marks a subscription as inactive. If chat_id is given, only a subscription
+        owned by that chat is affected.
+
+        Returns:
+            True if a subscription was updated, False otherwise.
+        """
+        cur = self._get_cursor()
+        if chat_id is None:
+            cur.execute(SQL_DEACTIVATE_SUBSCRIPTION, (subscription_id,))
+        else:
+            cur.execute(SQL_DEACTIVATE_CHAT_SUBSCRIPTION, (subscription_id, chat_id))
+        return cur.rowcount > 0
 
     def get_all_active_subscriptions(self) -> List[dict]:
         """Retrieves all active subscriptions from the database."""
         cur = self._get_cursor()
-        cur.execute(
-            "SELECT id, chat_id, address_id, address_name, notification_time, last_notified FROM subscriptions WHERE is_active = 1"
-        )
+        cur.execute(SQL_GET_ALL_ACTIVE_SUBSCRIPTIONS)
         return cur.fetchall()
 
     def update_subscription_last_notified(
@@ -217,15 +409,25 @@ class PersistenceService:
     ) -> None:
         """Updates the last_notified date for a subscription."""
         cur = self._get_cursor()
-        cur.execute(
-            "UPDATE subscriptions SET last_notified = ? WHERE id = ?",
-            (notification_date, subscription_id),
-        )
+        cur.execute(SQL_UPDATE_LAST_NOTIFIED, (notification_date, subscription_id))
+
+    def get_pending_notifications(
+        self, evening_date: Optional[str], morning_date: Optional[str]
+    ) -> List[dict]:
+        """
+        Retrieves the notifications that are due: active 'evening' subscriptions
+        with a collection on evening_date and 'morning' subscriptions with one on
+        morning_date (ISO format, or None to skip that group). Collections the
+        subscription was already notified about are excluded.
+        """
+        cur = self._get_cursor()
+        cur.execute(SQL_GET_PENDING_NOTIFICATIONS, (evening_date, morning_date))
+        return cur.fetchall()
 
     def get_all_waste_events(self) -> List[dict]:
         """Retrieves all waste events from the database."""
         cur = self._get_cursor()
-        cur.execute("SELECT * FROM waste_events")
+        cur.execute(SQL_GET_ALL_WASTE_EVENTS)
         return cur.fetchall()
 
     def get_address_by_id(self, address_id: int) -> Optional[str]:
@@ -236,7 +438,7 @@ class PersistenceService:
         """
         cur = self._get_cursor()
         # Try to find any active subscription with this address_id to get a user-friendly name
-        cur.execute("SELECT address_name FROM subscriptions WHERE address_id = ? AND address_name IS NOT NULL LIMIT 1", (address_id,))
+        cur.execute(SQL_GET_ADDRESS_BY_ID, (address_id,))
         row = cur.fetchone()
         if row:
             return row[0]
@@ -246,10 +448,7 @@ class PersistenceService:
     def create_notification_log(self, subscription_id: int, status: str) -> int:
         """Creates a new notification log entry and returns its ID."""
         cur = self._get_cursor()
-        cur.execute(
-            "INSERT INTO notification_logs (subscription_id, status) VALUES (?, ?)",
-            (subscription_id, status),
-        )
+        cur.execute(SQL_CREATE_NOTIFICATION_LOG, (subscription_id, status))
         return cur.lastrowid
 
     def update_notification_log_status(
@@ -257,18 +456,41 @@ class PersistenceService:
     ) -> None:
         """Updates the status of a notification log."""
         cur = self._get_cursor()
-        cur.execute(
-            "UPDATE notification_logs SET status = ?, error_message = ?, timestamp_sent = CURRENT_TIMESTAMP WHERE id = ?",
-            (status, error_message, log_id),
-        )
-        self._conn.commit()
+        cur.execute(SQL_UPDATE_NOTIFICATION_LOG_STATUS, (status, error_message, log_id))
+
+    def create_pending_notification_logs(self, subscription_ids: List[int]) -> List[int]:
+        """
+        Creates a 'pending' log entry for each subscription and returns the log
+        IDs in the same order. All rows are written in the caller's transaction.
+        """
+        cur = self._get_cursor()
+        log_ids = []
+        for subscription_id in subscription_ids:
+            cur.execute(SQL_CREATE_PENDING_NOTIFICATION_LOG, (subscription_id,))
+            log_ids.append(cur.fetchone()[0])
+        return log_ids
+
+    def finalize_notifications(
+        self,
+        log_statuses: List[tuple],
+        last_notified: List[tuple],
+    ) -> None:
+        """
+        Records the outcome of a notification run.
+
+        Args:
+            log_statuses: (status, error_message, log_id) tuples.
+            last_notified: (notification_date, subscription_id) tuples for the
+                notifications that were delivered.
+        """
+        cur = self._get_cursor()
+        cur.executemany(SQL_UPDATE_NOTIFICATION_LOG_STATUS, log_statuses)
+        cur.executemany(SQL_UPDATE_LAST_NOTIFIED, last_notified)
 
     def get_all_logs(self) -> List[dict]:
         """Retrieves all logs from the database, ordered by timestamp descending."""
         cur = self._get_cursor()
-        cur.execute(
-            "SELECT * FROM logs ORDER BY timestamp DESC LIMIT 100"
-        )  # Limit to 100 to avoid overwhelming the dashboard
+        cur.execute(SQL_GET_ALL_LOGS)
         return cur.fetchall()
 
     def get_unique_subscribed_locations(self) -> List[dict]:
@@ -277,70 +499,25 @@ class PersistenceService:
         that have at least one active subscription.
         """
         cur = self._get_cursor()
-
-        query = """
-            SELECT DISTINCT
-                address_id,
-                address_name as address
-            FROM
-                subscriptions
-            WHERE
-                is_active = 1
-            GROUP BY address_id;
-        """
-
-        cur.execute(query)
-        # We pick one name for the address_id. Since we grouped by address_id, it will return one row per ID.
+        cur.execute(SQL_GET_UNIQUE_SUBSCRIBED_LOCATIONS)
         return [dict(row) for row in cur.fetchall()]
 
-    def get_next_waste_event_for_subscription(
-        self, address_id: int, today_date: str
-    ) -> Optional[dict]:
+    def get_next_pickups_by_chat_id(self, chat_id: int, today_date: str) -> List[dict]:
         """
-        Retrieves the next waste event for a given address_id that is on or after today's date.
+        Retrieves the next waste event on or after today's date for each of a
+        chat's active subscriptions. Each row holds the event's columns plus the
+        subscription's resolved display name in 'address'.
         """
         cur = self._get_cursor()
-
-        # Now we can query by address_id directly
-        cur.execute(
-             """
-            SELECT * FROM waste_events
-            WHERE address_id = ? AND date >= ?
-            ORDER BY date ASC
-            LIMIT 1
-            """,
-            (address_id, today_date),
-        )
-        row = cur.fetchone()
-        return dict(row) if row else None
+        cur.execute(SQL_GET_NEXT_PICKUPS_BY_CHAT_ID, (chat_id, today_date))
+        return cur.fetchall()
 
     def record_system_info(self, key: str, value: str) -> None:
         """Records a key-value pair in the system_info table."""
-        # This method manages its own connection if one isn't already open,
-        # or uses the existing one. However, standard pattern here is 'with ...' usage.
-        # If called from outside a 'with' block, we need to handle connection.
-        # But 'PersistenceService' design expects usage within a context manager or explicit open.
-        # Given how it's used in bot.py (start time), it's a one-off.
-        # We'll allow it to open a temp connection if self._conn is None.
-
-        close_conn = False
-        if self._conn is None:
-             self._conn = sqlite3.connect(self.db_path)
-             self._cursor = self._conn.cursor()
-             close_conn = True
-
-        try:
-            cur = self._cursor
-            cur.execute(
-                "INSERT OR REPLACE INTO system_info (key, value) VALUES (?, ?)",
-                (key, value),
-            )
-            self._conn.commit()
-        finally:
-            if close_conn:
-                self._conn.close()
-                self._conn = None
-                self._cursor = None
+        # Usually a one-off call outside a 'with' block (e.g. the bot start
+        # time); inside one, it joins the surrounding unit of work.
+        with self:
+            self._get_cursor().execute(SQL_RECORD_SYSTEM_INFO, (key, value))
 
     def check_events_existence(self, address_id: int, year: int) -> bool:
         """
@@ -357,10 +534,7 @@ class PersistenceService:
         start_date = f"{year}-01-01"
         end_date = f"{year}-12-31"
 
-        cur.execute(
-            "SELECT 1 FROM waste_events WHERE address_id = ? AND date BETWEEN ? AND ? LIMIT 1",
-            (address_id, start_date, end_date)
-        )
+        cur.execute(SQL_CHECK_EVENTS_EXISTENCE, (address_id, start_date, end_date))
         return cur.fetchone() is not None
 
     def get_location_name_from_events(self, address_id: int) -> Optional[str]:
@@ -374,9 +548,6 @@ class PersistenceService:
             The address name if found, else None.
         """
         cur = self._get_cursor()
-        cur.execute(
-            "SELECT location FROM waste_events WHERE address_id = ? AND location IS NOT NULL AND location != '' LIMIT 1",
-            (address_id,)
-        )
+        cur.execute(SQL_GET_LOCATION_NAME_FROM_EVENTS, (address_id,))
         row = cur.fetchone()
         return row[0] if row else None
@@ -3,6 +3,7 @@ This module defines the ScheduleService for downloading and parsing iCal files.
 """
 
 import logging
+import random
 import re
 import time
 from datetime import date
@@ -69,9 +70,17 @@ class ScheduleService:
                         f"All {self.max_retries} download attempts failed for location {standort_id}."
                     )
                     raise
-                time.sleep(self.retry_delay)
+                time.sleep(self._get_retry_delay(attempt))
         return []  # Should be unreachable
 
+    def _get_retry_delay(self, attempt: int) -> float:
+        """
+        Returns the wait before the next attempt: exponential backoff capped at
+        retry_delay, plus up to a second of jitter so parallel retries don't hit
+        the server in lockstep, even once the cap is reached.
+        """
+        return min(self.retry_delay, 2**attempt) + random.uniform(0, 1)
+
     def get_address_from_id(self, standort_id: int) -> Optional[str]:
         """
         Downloads the schedule for the current year to extract the address name.
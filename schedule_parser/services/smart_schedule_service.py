@@ -4,11 +4,13 @@ This module defines the SmartScheduleService for intelligently updating waste sc
 
 import asyncio
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import date, timedelta
 
 import holidays
 
-from schedule_parser.config import SCHEDULE_UPDATE_INTERVAL_HOURS
+from schedule_parser.config import (SCHEDULE_DOWNLOAD_WORKERS,
+                                    SCHEDULE_UPDATE_INTERVAL_HOURS)
 
 from ..exceptions import DownloadError, ParsingError
 from .persistence_service import PersistenceService
@@ -16,6 +18,9 @@ from .schedule_service import ScheduleService
 
 logger = logging.getLogger(__name__)
 
+# Shared by all instances so the lazily computed per-year data is built once per process.
+german_holidays = holidays.Germany(subdiv="SN")  # Saxony
+
 
 class SmartScheduleService:
     """
@@ -31,7 +36,7 @@ class SmartScheduleService:
         self.persistence_service = persistence_service
         self.schedule_service = schedule_service
         self.weeks_to_fetch = weeks_to_fetch
-        self.german_holidays = holidays.Germany(subdiv="SN")  # Saxony
+        self.german_holidays = german_holidays
 
     def update_all_schedules(self) -> None:
         """
@@ -49,50 +54,75 @@ class SmartScheduleService:
 
         start_date = date.today()
         end_date = start_date + timedelta(weeks=self.weeks_to_fetch)
+        # Resolve the holidays in the fetch window once; slicing excludes the stop date.
+        holiday_dates = frozenset(
+            self.german_holidays[start_date : end_date + timedelta(days=1)]
+        )
+
+        # Downloads spend most of their time waiting on the server, so they run
+        # in parallel; events are stored on this thread, which owns the
+        # database connection, while the remaining downloads continue.
+        with ThreadPoolExecutor(max_workers=SCHEDULE_DOWNLOAD_WORKERS) as executor:
+            downloads = [
+                executor.submit(
+                    self.schedule_service.download_and_parse_schedule,
+                    location["address_id"],
+                    start_date,
+                    end_date,
+                    location["address"],
+                )
+                for location in unique_locations
+            ]
+            for location, download in zip(unique_locations, downloads):
+                self._store_downloaded_events(
+                    location, download, start_date, holiday_dates
+                )
 
-        for location in unique_locations:
-            standort_id = location["address_id"]
-            original_address = location["address"]
-
-            logger.info(
-                f"Processing schedule for {original_address} (ID: {standort_id})."
-            )
+        logger.info("Smart schedule update completed.")
 
-            try:
-                new_events = self.schedule_service.download_and_parse_schedule(
-                    standort_id, start_date, end_date, original_address
+    def _store_downloaded_events(
+        self,
+        location: dict,
+        download: Future,
+        start_date: date,
+        holiday_dates: frozenset,
+    ) -> None:
+        """Stores a location's downloaded events, skipping holidays and past dates."""
+        standort_id = location["address_id"]
+        original_address = location["address"]
+
+        logger.info(f"Processing schedule for {original_address} (ID: {standort_id}).")
+
+        try:
+            new_events = download.result()
+
+            if not new_events:
+                logger.warning(
+                    f"No events found for {original_address}. It might be a holiday period or an issue with the source."
                 )
+                return
 
-                if not new_events:
-                    logger.warning(
-                        f"No events found for {original_address}. It might be a holiday period or an issue with the source."
-                    )
-                    continue
-
-                # Filter out holidays and past dates
-                valid_events = [
-                    event
-                    for event in new_events
-                    if date.fromisoformat(event.date) >= start_date
-                    and date.fromisoformat(event.date) not in self.german_holidays
-                ]
-
-                with self.persistence_service as db:
-                    for event in valid_events:
-                        db.upsert_event(event)
-
-                logger.info(f"Successfully updated schedule for {original_address}.")
-
-            except (DownloadError, ParsingError) as e:
-                logger.error(
-                    f"Failed to update schedule for {original_address} (ID: {standort_id}): {e}"
-                )
-            except Exception as e:
-                logger.exception(
-                    f"An unexpected error occurred while updating schedule for {original_address} (ID: {standort_id}): {e}"
-                )
+            # Filter out holidays and past dates
+            valid_events = []
+            for event in new_events:
+                event_date = date.fromisoformat(event.date)
+                if event_date >= start_date and event_date not in holiday_dates:
+                    valid_events.append(event)
 
-        logger.info("Smart schedule update completed.")
+            with self.persistence_service as db:
+                for event in valid_events:
+                    db.upsert_event(event)
+
+            logger.info(f"Successfully updated schedule for {original_address}.")
+
+        except (DownloadError, ParsingError) as e:
+            logger.error(
+                f"Failed to update schedule for {original_address} (ID: {standort_id}): {e}"
+            )
+        except Exception as e:
+            logger.exception(
+                f"An unexpected error occurred while updating schedule for {original_address} (ID: {standort_id}): {e}"
+            )
 
     async def run_scheduler(self) -> None:
         """
@@ -101,7 +131,9 @@ class SmartScheduleService:
         while True:
             try:
                 logger.info("Running smart schedule update...")
-                self.update_all_schedules()
+                # The update blocks on downloads and the database, so it runs in
+                # a worker thread to keep the bot responsive.
+                await asyncio.to_thread(self.update_all_schedules)
                 logger.info("Smart schedule update finished.")
             except Exception as e:
                 logger.exception(
@@ -2,7 +2,7 @@
 This module defines the SubscriptionService for managing user subscriptions.
 """
 
-from typing import List
+from typing import List, Optional
 
 from .persistence_service import PersistenceService
 
@@ -29,10 +29,20 @@ class SubscriptionService:
         with self.persistence as p:
             return p.get_subscriptions_by_chat_id(chat_id)
 
-    def remove_subscription(self, subscription_id: int) -> None:
-        """Marks a subscription as inactive (soft delete)."""
+    def get_user_subscriptions_with_names(self, chat_id: int) -> List[dict]:
+        """Retrieves a user's active subscriptions including their display names."""
         with self.persistence as p:
-            p.deactivate_subscription(subscription_id)
+            return p.get_subscriptions_with_names_by_chat_id(chat_id)
+
+    def remove_subscription(
+        self, subscription_id: int, chat_id: Optional[int] = None
+    ) -> bool:
+        """
+        Marks a subscription as inactive (soft delete). If chat_id is given, the
+        subscription must belong to that chat.
+        """
+        with self.persistence as p:
+            return p.deactivate_subscription(subscription_id, chat_id)
 
     def get_all_active_subscriptions(self) -> List[dict]:
         """Retrieves all active subscriptions from the database."""
@@ -0,0 +1,19 @@
+"""
+This module maps waste types to the emoji shown next to them in messages.
+"""
+
+# Waste types come from the schedule as e.g. "Bio-Tonne" or "Gelbe Tonne", so
+# the first three letters are enough to tell them apart.
+_EMOJI_BY_PREFIX = {
+    "bio": "🟢",
+    "pap": "🔵",
+    "gel": "🟡",
+    "ver": "🟡",
+    "res": "⚫",
+}
+DEFAULT_EMOJI = "🗑️"
+
+
+def get_waste_type_emoji(waste_type: str) -> str:
+    """Returns an emoji for a given waste type."""
+    return _EMOJI_BY_PREFIX.get(waste_type[:3].lower(), DEFAULT_EMOJI)
@@ -4,40 +4,122 @@ This module contains the main logic for the Telegram bot, refactored to use the
 
 import asyncio
 import logging
-import sqlite3
-from datetime import datetime
-
-from telegram import ReplyKeyboardMarkup, ReplyKeyboardRemove, Update
-from telegram.ext import (AIORateLimiter, Application, CommandHandler,
-                          ContextTypes, ConversationHandler, MessageHandler,
-                          filters)
-
-from schedule_parser.config import (TELEGRAM_BOT_TOKEN,
-                                    TELEGRAM_RATE_LIMIT_GROUP,
+import warnings
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from aiolimiter import AsyncLimiter
+from telegram import (InlineKeyboardButton, InlineKeyboardMarkup,
+                      ReplyKeyboardMarkup, ReplyKeyboardRemove, Update)
+from telegram.ext import (AIORateLimiter, Application, ApplicationHandlerStop,
+                          CallbackQueryHandler, CommandHandler, ContextTypes,
+                          ConversationHandler, MessageHandler,
+                          PersistenceInput, PicklePersistence, filters)
+from telegram.warnings import PTBUserWarning
+
+from schedule_parser.config import (BOT_PERSISTENCE_PATH, TELEGRAM_BOT_TOKEN,
+                                    TELEGRAM_RATE_LIMIT_GROUP_PER_MINUTE,
                                     TELEGRAM_RATE_LIMIT_OVERALL,
-                                    TELEGRAM_RATE_LIMIT_PER_CHAT,
-                                    WASTE_SCHEDULE_DB_PATH)
+                                    TELEGRAM_RATE_LIMIT_PER_CHAT)
 from schedule_parser.exceptions import DownloadError, ParsingError
 # Import services and facade
 from schedule_parser.facade import WasteManagementFacade
+from schedule_parser.waste_types import get_waste_type_emoji
 
-from .context import CustomContext
+from .context import STATE_KEY, ConversationState, CustomContext
 from .scheduler import scheduler
 
 logger = logging.getLogger(__name__)
 
 # States for conversation
 # ADDRESS removed. New flow: LOCATION_ID -> NAME_CHOICE -> (CUSTOM_NAME) -> NOTIFICATION_TIME
-LOCATION_ID, NAME_CHOICE, CUSTOM_NAME, NOTIFICATION_TIME, SELECT_SUB = range(5)
+LOCATION_ID, NAME_CHOICE, CUSTOM_NAME, NOTIFICATION_TIME = range(4)
+
+# Callback data of the /unsubscribe inline buttons: "unsub:<subscription_id>"
+UNSUBSCRIBE_CALLBACK_PREFIX = "unsub:"
+# Callback data of the notification time buttons: "time:<notification_time>"
+NOTIFICATION_TIME_CALLBACK_PREFIX = "time:"
 
 Context = CustomContext
 
+# Keys of the per-chat AsyncLimiter in context.chat_data, and of whether the
+# chat was already told that its commands are being dropped
+_CHAT_LIMITER_KEY = "rate_limiter"
+_CHAT_THROTTLED_KEY = "rate_limited"
+
+# Verifications currently running, by location ID
+_inflight_verifications: Dict[int, "asyncio.Task[Optional[str]]"] = {}
+
+# Location IDs are short positive integers; longer input is rejected unparsed.
+_MAX_LOCATION_ID_LENGTH = 10
+
+_START_TEXT = (
+    "Hallo! Ich bin der DumpDate-Bot. Nutze /subscribe, um einen neuen Standort zu abonnieren."
+)
+
+# Message templates for /mysubscriptions and /nextpickup
+_SUBSCRIPTION_LINE = "- {address} ({time})\n"
+_PICKUP_LINE = "📍 <b>{address}</b>\n   {emoji} {waste_type} am {date}\n\n"
+_MORNING_LABEL = "Morgen der Abholung"
+_NOTIFICATION_TIME_LABELS = {"evening": "Abend vorher", "morning": _MORNING_LABEL}
+
+# Fixed keyboards are immutable, so they are built once and reused.
+_NAME_CHOICE_KEYBOARD = ReplyKeyboardMarkup(
+    [["Ja, behalten", "Nein, ändern"]], one_time_keyboard=True
+)
+_TIME_KEYBOARD = InlineKeyboardMarkup(
+    [
+        [
+            InlineKeyboardButton(
+                "Abend vorher (19 Uhr)",
+                callback_data=f"{NOTIFICATION_TIME_CALLBACK_PREFIX}evening",
+            ),
+            InlineKeyboardButton(
+                "Morgen der Abholung (6 Uhr)",
+                callback_data=f"{NOTIFICATION_TIME_CALLBACK_PREFIX}morning",
+            ),
+        ]
+    ]
+)
+_KB_REMOVE = ReplyKeyboardRemove()
+
+
+def _get_state(context: Context) -> ConversationState:
+    """Returns the chat's conversation state, creating it if necessary."""
+    return context.user_data.setdefault(STATE_KEY, ConversationState())
+
+
+async def _verify_location_id(context: Context, location_id: int) -> Optional[str]:
+    """
+    Verifies a location ID in a worker thread. Concurrent requests for the same
+    ID share one verification instead of each downloading the schedule.
+    """
+    task = _inflight_verifications.get(location_id)
+    if task is None:
+        task = asyncio.create_task(
+            asyncio.to_thread(context.facade.verify_location_id, location_id)
+        )
+        _inflight_verifications[location_id] = task
+        task.add_done_callback(lambda _: _inflight_verifications.pop(location_id, None))
+    # Shielded so that one cancelled handler does not cancel the others waiting.
+    return await asyncio.shield(task)
+
+
+def _parse_location_id(text: str) -> Optional[int]:
+    """Parses a positive location ID, returning None for invalid input."""
+    text = text.strip()
+    if not 1 <= len(text) <= _MAX_LOCATION_ID_LENGTH:
+        return None
+    try:
+        location_id = int(text)
+    except ValueError:
+        return None
+    return location_id if location_id > 0 else None
+
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Sends a welcome message."""
-    await update.message.reply_text(
-        "Hallo! Ich bin der DumpDate-Bot. Nutze /subscribe, um einen neuen Standort zu abonnieren."
-    )
+    await update.message.reply_text(_START_TEXT)
 
 
 async def subscribe(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -46,25 +128,24 @@ async def subscribe(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         "Bitte gib die Standort-ID ein (z.B. 54367).\n"
         "Die ID findest du über die Webseite der Stadt Dresden oder wie in der Dokumentation beschrieben."
     )
+    context.user_data[STATE_KEY] = ConversationState()
     return LOCATION_ID
 
 
 async def handle_location_id_input(update: Update, context: Context) -> int:
     """Handles the user's location ID input and verifies it."""
     try:
-        location_id_str = update.message.text.strip()
-        if not location_id_str.isdigit():
+        location_id = _parse_location_id(update.message.text)
+        if location_id is None:
              await update.message.reply_text(
                 "Bitte gib eine gültige Zahl als Standort-ID ein."
             )
              return LOCATION_ID
 
-        location_id = int(location_id_str)
-
         await update.message.reply_text("Überprüfe ID...")
 
         # Verify and fetch address name
-        address_name = context.facade.verify_location_id(location_id)
+        address_name = await _verify_location_id(context, location_id)
 
         if not address_name:
             await update.message.reply_text(
@@ -73,18 +154,18 @@ async def handle_location_id_input(update: Update, context: Context) -> int:
             )
             return LOCATION_ID
 
-        context.user_data["selected_location_id"] = location_id
-        context.user_data["detected_address_name"] = address_name
+        state = _get_state(context)
+        state.location_id = location_id
+        state.detected_name = address_name
 
-        reply_keyboard = [["Ja, behalten", "Nein, ändern"]]
         await update.message.reply_text(
             f"Gefundene Adresse: '{address_name}'.\nMöchtest du diesen Namen behalten?",
-            reply_markup=ReplyKeyboardMarkup(reply_keyboard, one_time_keyboard=True),
+            reply_markup=_NAME_CHOICE_KEYBOARD,
         )
         return NAME_CHOICE
 
     except Exception as e:
-        logger.error(f"Error in handle_location_id_input: {e}")
+        logger.error("Error in handle_location_id_input: %s", e)
         await update.message.reply_text(
             "Ein unerwarteter Fehler ist aufgetreten. Bitte versuche es später erneut."
         )
@@ -96,18 +177,19 @@ async def handle_name_choice(update: Update, context: Context) -> int:
     choice = update.message.text
 
     if choice == "Ja, behalten":
-        context.user_data["final_address_name"] = context.user_data["detected_address_name"]
+        state = _get_state(context)
+        state.final_name = state.detected_name
         return await ask_notification_time(update, context)
     elif choice == "Nein, ändern":
         await update.message.reply_text(
             "Bitte gib den gewünschten Namen für diesen Standort ein:",
-            reply_markup=ReplyKeyboardRemove()
+            reply_markup=_KB_REMOVE
         )
         return CUSTOM_NAME
     else:
         await update.message.reply_text(
             "Bitte wähle eine der Optionen.",
-             reply_markup=ReplyKeyboardMarkup([["Ja, behalten", "Nein, ändern"]], one_time_keyboard=True)
+             reply_markup=_NAME_CHOICE_KEYBOARD
         )
         return NAME_CHOICE
 
@@ -118,60 +200,64 @@ async def handle_custom_name(update: Update, context: Context) -> int:
          await update.message.reply_text("Der Name darf nicht leer sein. Bitte versuche es erneut.")
          return CUSTOM_NAME
 
-    context.user_data["final_address_name"] = custom_name
+    _get_state(context).final_name = custom_name
     return await ask_notification_time(update, context)
 
 
 async def ask_notification_time(update: Update, context: Context) -> int:
     """Asks for notification time."""
-    reply_keyboard = [["Abend vorher (19 Uhr)", "Morgen der Abholung (6 Uhr)"]]
     await update.message.reply_text(
         "Wann möchtest du benachrichtigt werden?",
-        reply_markup=ReplyKeyboardMarkup(reply_keyboard, one_time_keyboard=True),
+        reply_markup=_TIME_KEYBOARD,
     )
     return NOTIFICATION_TIME
 
 
 async def set_notification_time(update: Update, context: Context) -> int:
-    """Handles notification time, triggers the facade, and ends the conversation."""
-    notification_choice = update.message.text
-    notification_time = "evening" if "Abend" in notification_choice else "morning"
-    chat_id = update.message.chat_id
-
-    location_id = context.user_data["selected_location_id"]
-    address_name = context.user_data["final_address_name"]
-
-    await update.message.reply_text(
-        f"Richte Abonnement für '{address_name}' (ID: {location_id}) ein...",
-        reply_markup=ReplyKeyboardRemove(),
+    """Handles the notification time button, triggers the facade, and ends the conversation."""
+    query = update.callback_query
+    await query.answer()
+    # The button's callback data carries the stored value, e.g. "time:evening"
+    notification_time = query.data.removeprefix(NOTIFICATION_TIME_CALLBACK_PREFIX)
+    message = query.message
+    chat_id = message.chat_id
+
+    state = _get_state(context)
+    location_id = state.location_id
+    address_name = state.final_name
+
+    # Replacing the question also removes its buttons
+    await query.edit_message_text(
+        f"Richte Abonnement für '{address_name}' (ID: {location_id}) ein..."
     )
 
     try:
-        success = context.facade.subscribe_address_for_user(
+        success = await asyncio.to_thread(
+            context.facade.subscribe_address_for_user,
             chat_id=chat_id,
             address_id=location_id,
             address_name=address_name,
             notification_time=notification_time,
         )
         if success:
-            await update.message.reply_text("Abonnement erfolgreich eingerichtet!")
+            await message.reply_text("Abonnement erfolgreich eingerichtet!")
         else:
-            await update.message.reply_text(
+            await message.reply_text(
                 "Ein interner Fehler hat die Einrichtung verhindert. Bitte versuche es später erneut."
             )
     except (ValueError, FileNotFoundError) as e:
-        await update.message.reply_text(f"Fehler: {e}")
+        await message.reply_text(f"Fehler: {e}")
     except DownloadError:
-        await update.message.reply_text(
+        await message.reply_text(
             "Fehler beim Herunterladen des Abfallkalenders. Bitte versuche es später erneut."
         )
     except ParsingError:
-        await update.message.reply_text(
+        await message.reply_text(
             "Fehler beim Verarbeiten des Abfallkalenders. Bitte den Administrator informieren."
         )
     except Exception as e:
-        logger.error(f"Unexpected error in set_notification_time: {e}")
-        await update.message.reply_text("Ein unerwarteter Fehler ist aufgetreten.")
+        logger.error("Unexpected error in set_notification_time: %s", e)
+        await message.reply_text("Ein unerwarteter Fehler ist aufgetreten.")
 
     context.user_data.clear()
     return ConversationHandler.END
@@ -180,80 +266,83 @@ async def set_notification_time(update: Update, context: Context) -> int:
 async def my_subscriptions(update: Update, context: Context) -> None:
     """Displays the user's current subscriptions."""
     chat_id = update.message.chat_id
-    subscriptions = context.facade.get_user_subscriptions(chat_id)
+    subscriptions = await asyncio.to_thread(
+        context.facade.get_user_subscriptions_with_names, chat_id
+    )
     if not subscriptions:
         await update.message.reply_text("Du hast keine aktiven Benachrichtigungen.")
         return
 
-    message = "Deine aktiven Benachrichtigungen:\n\n"
-    for sub in subscriptions:
-        # Use address_name if available, otherwise fetch from ID (or fallback)
-        address = sub["address_name"] or context.facade.get_address_by_id(sub["address_id"])
-        time_str = (
-            "Abend vorher"
-            if sub["notification_time"] == "evening"
-            else "Morgen der Abholung"
+    message = "Deine aktiven Benachrichtigungen:\n\n" + "".join(
+        _SUBSCRIPTION_LINE.format(
+            address=sub["address"],
+            time=_NOTIFICATION_TIME_LABELS.get(sub["notification_time"], _MORNING_LABEL),
         )
-        message += f"- {address} ({time_str})\n"
+        for sub in subscriptions
+    )
     await update.message.reply_text(message)
 
 
-async def unsubscribe(update: Update, context: Context) -> int:
-    """Starts the unsubscribe conversation."""
+async def unsubscribe(update: Update, context: Context) -> None:
+    """Lists the user's subscriptions as inline buttons to unsubscribe from."""
     chat_id = update.message.chat_id
-    subscriptions = context.facade.get_user_subscriptions(chat_id)
+    subscriptions = await asyncio.to_thread(
+        context.facade.get_user_subscriptions_with_names, chat_id
+    )
     if not subscriptions:
         await update.message.reply_text(
             "Du hast keine aktiven Benachrichtigungen zum Abbestellen."
         )
-        return ConversationHandler.END
-
-    context.user_data["subscriptions"] = {
-        f"{sub['address_name'] or context.facade.get_address_by_id(sub['address_id'])}": sub["id"]
-        for sub in subscriptions
-    }
+        return
 
-    reply_keyboard = [
-        [address] for address in context.user_data["subscriptions"].keys()
-    ]
+    keyboard = InlineKeyboardMarkup(
+        [
+            [
+                InlineKeyboardButton(
+                    sub["address"], callback_data=f"{UNSUBSCRIBE_CALLBACK_PREFIX}{sub['id']}"
+                )
+            ]
+            for sub in subscriptions
+        ]
+    )
     await update.message.reply_text(
         "Wähle eine Benachrichtigung zum Abbestellen aus:",
-        reply_markup=ReplyKeyboardMarkup(reply_keyboard, one_time_keyboard=True),
+        reply_markup=keyboard,
     )
-    return SELECT_SUB
-
 
-async def select_sub_to_unsubscribe(update: Update, context: Context) -> int:
-    """Handles the selection of a subscription to unsubscribe from."""
-    selected_address = update.message.text
-    sub_id = context.user_data.get("subscriptions", {}).get(selected_address)
 
-    if not sub_id:
-        await update.message.reply_text(
-            "Ungültige Auswahl. Bitte wähle eine der Optionen."
-        )
-        return SELECT_SUB
+async def handle_unsubscribe_choice(update: Update, context: Context) -> None:
+    """Unsubscribes from the subscription whose inline button was pressed."""
+    query = update.callback_query
+    await query.answer()
+    sub_id = int(query.data.removeprefix(UNSUBSCRIBE_CALLBACK_PREFIX))
 
-    success = context.facade.unsubscribe(sub_id)
+    # The callback data comes from the client, so the subscription must belong to this chat.
+    success = await asyncio.to_thread(
+        context.facade.unsubscribe, sub_id, update.effective_chat.id
+    )
     if success:
-        await update.message.reply_text(
-            "Benachrichtigung erfolgreich abbestellt.",
-            reply_markup=ReplyKeyboardRemove(),
-        )
+        await query.edit_message_text("Benachrichtigung erfolgreich abbestellt.")
     else:
-        await update.message.reply_text(
-            "Ein Fehler ist beim Abbestellen aufgetreten.",
-            reply_markup=ReplyKeyboardRemove(),
-        )
-
-    context.user_data.clear()
-    return ConversationHandler.END
+        await query.edit_message_text("Ein Fehler ist beim Abbestellen aufgetreten.")
+
+
+async def handle_expired_menu(update: Update, context: Context) -> None:
+    """
+    Answers button presses no other handler took, e.g. a notification time
+    button whose conversation has already ended, so the client stops waiting.
+    """
+    query = update.callback_query
+    await query.answer("Dieses Menü ist abgelaufen.")
+    await query.edit_message_text(
+        "Dieses Menü ist abgelaufen. Bitte starte den Vorgang erneut, z. B. mit /subscribe."
+    )
 
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Cancels and ends the conversation."""
     await update.message.reply_text(
-        "Vorgang abgebrochen.", reply_markup=ReplyKeyboardRemove()
+        "Vorgang abgebrochen.", reply_markup=_KB_REMOVE
     )
     context.user_data.clear()
     return ConversationHandler.END
@@ -262,7 +351,7 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 async def next_pickup(update: Update, context: Context) -> None:
     """Displays the next pickup for each of the user's subscriptions."""
     chat_id = update.message.chat_id
-    pickups = context.facade.get_next_pickup_for_user(chat_id)
+    pickups = await asyncio.to_thread(context.facade.get_next_pickup_for_user, chat_id)
 
     if not pickups:
         await update.message.reply_text(
@@ -270,100 +359,164 @@ async def next_pickup(update: Update, context: Context) -> None:
         )
         return
 
-    message = "<b>Nächste Abholungen:</b>\n\n"
-    for pickup in pickups:
-        address = pickup["address"]
-        event = pickup["event"]
-        # Simple emoji mapping
-        emoji_map = {
-            "Restabfall": "⚫",
-            "Bioabfall": "🟤",
-            "Papier": "🔵",
-            "Gelbe Tonne": "🟡",
-        }
-        emoji = emoji_map.get(event["waste_type"], "🗑️")
-        message += f"📍 <b>{address}</b>\n"
-        message += f"   {emoji} {event['waste_type']} am {event['date']}\n\n"
+    parts = ["<b>Nächste Abholungen:</b>\n\n"]
+    parts.extend(
+        _PICKUP_LINE.format(
+            address=pickup["address"],
+            emoji=get_waste_type_emoji(pickup["event"]["waste_type"]),
+            waste_type=pickup["event"]["waste_type"],
+            date=pickup["event"]["date"],
+        )
+        for pickup in pickups
+    )
+    message = "".join(parts)
 
     await update.message.reply_text(message, parse_mode="HTML")
 
 
+async def enforce_chat_rate_limit(update: Update, context: Context) -> None:
+    """
+    Drops commands from chats that send more than TELEGRAM_RATE_LIMIT_PER_CHAT
+    commands per second, so a single chat cannot use up the bot's overall
+    budget. The chat is told once per burst; conversation replies and button
+    presses are never dropped.
+    """
+    if update.effective_chat is None:
+        return
+
+    limiter = context.chat_data.get(_CHAT_LIMITER_KEY)
+    if limiter is None:
+        limiter = AsyncLimiter(TELEGRAM_RATE_LIMIT_PER_CHAT, 1)
+        context.chat_data[_CHAT_LIMITER_KEY] = limiter
+
+    if not limiter.has_capacity():
+        logger.warning(
+            "Dropping command from chat_id %s: rate limit exceeded.",
+            update.effective_chat.id,
+        )
+        if not context.chat_data.get(_CHAT_THROTTLED_KEY):
+            context.chat_data[_CHAT_THROTTLED_KEY] = True
+            await update.effective_message.reply_text(
+                "Bitte nicht so schnell! Versuche es gleich noch einmal."
+            )
+        raise ApplicationHandlerStop
+    context.chat_data[_CHAT_THROTTLED_KEY] = False
+    await limiter.acquire()
+
+
 def setup_handlers(application: Application) -> None:
     """Start the bot."""
 
-    # Subscription Conversation
-    subscribe_conv = ConversationHandler(
-        entry_points=[CommandHandler("subscribe", subscribe)],
-        states={
-            LOCATION_ID: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_location_id_input)
-            ],
-            NAME_CHOICE: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_name_choice)
-            ],
-            CUSTOM_NAME: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_custom_name)
-            ],
-            NOTIFICATION_TIME: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, set_notification_time)
-            ],
-        },
-        fallbacks=[CommandHandler("cancel", cancel)],
+    # Runs before all other handlers
+    application.add_handler(
+        MessageHandler(filters.COMMAND, enforce_chat_rate_limit), group=-1
     )
 
-    # Unsubscribe Conversation
-    unsubscribe_conv = ConversationHandler(
-        entry_points=[CommandHandler("unsubscribe", unsubscribe)],
-        states={
-            SELECT_SUB: [
-                MessageHandler(
-                    filters.TEXT & ~filters.COMMAND, select_sub_to_unsubscribe
-                )
-            ],
-        },
-        fallbacks=[CommandHandler("cancel", cancel)],
-    )
+    # Subscription Conversation
+    # The conversation is tracked per chat and user, which is all the time
+    # buttons need, but PTB warns about any CallbackQueryHandler in it.
+    with warnings.catch_warnings():
+        warnings.filterwarnings(
+            "ignore", message="If 'per_message=False'", category=PTBUserWarning
+        )
+        subscribe_conv = ConversationHandler(
+            entry_points=[CommandHandler("subscribe", subscribe)],
+            states={
+                LOCATION_ID: [
+                    MessageHandler(filters.TEXT & ~filters.COMMAND, handle_location_id_input)
+                ],
+                NAME_CHOICE: [
+                    MessageHandler(filters.TEXT & ~filters.COMMAND, handle_name_choice)
+                ],
+                CUSTOM_NAME: [
+                    MessageHandler(filters.TEXT & ~filters.COMMAND, handle_custom_name)
+                ],
+                NOTIFICATION_TIME: [
+                    CallbackQueryHandler(
+                        set_notification_time,
+                        pattern=rf"^{NOTIFICATION_TIME_CALLBACK_PREFIX}(evening|morning)$",
+                    ),
+                    # Typed text gets the buttons again
+                    MessageHandler(filters.TEXT & ~filters.COMMAND, ask_notification_time),
+                ],
+            },
+            fallbacks=[CommandHandler("cancel", cancel)],
+            name="subscribe",
+            persistent=application.persistence is not None,
+        )
 
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("mysubscriptions", my_subscriptions))
-    application.add_handler(CommandHandler("nextpickup", next_pickup))
+    # Read-only commands don't need ordering, so they run as their own tasks
+    # instead of holding up the updates queued behind them.
+    application.add_handler(CommandHandler("start", start, block=False))
+    application.add_handler(
+        CommandHandler("mysubscriptions", my_subscriptions, block=False)
+    )
+    application.add_handler(CommandHandler("nextpickup", next_pickup, block=False))
     application.add_handler(subscribe_conv)
-    application.add_handler(unsubscribe_conv)
+    application.add_handler(CommandHandler("unsubscribe", unsubscribe))
+    application.add_handler(
+        CallbackQueryHandler(
+            handle_unsubscribe_choice, pattern=rf"^{UNSUBSCRIBE_CALLBACK_PREFIX}\d+$"
+        )
+    )
+    # Registered last, so it only gets button presses nothing above handled
+    application.add_handler(CallbackQueryHandler(handle_expired_menu))
 
 
-def record_bot_start_time(facade_instance: WasteManagementFacade):
-    """Records the bot's start time in the system_info table."""
+def record_bot_start_time(facade_instance: WasteManagementFacade, started_at: str):
+    """Records the bot's start time (an ISO 8601 UTC timestamp) in the system_info table."""
     try:
         facade_instance.persistence_service.record_system_info(
-            "bot_start_time", datetime.now().isoformat()
+            "bot_start_time", started_at
         )
     except Exception as e:
-        logger.error(f"Failed to record bot start time: {e}")
+        logger.error("Failed to record bot start time: %s", e)
+
+
+def build_rate_limiter() -> AIORateLimiter:
+    """
+    Builds the limiter for outgoing requests: TELEGRAM_RATE_LIMIT_OVERALL per
+    second overall and TELEGRAM_RATE_LIMIT_GROUP_PER_MINUTE to each group.
+    Telegram's 429 responses are retried a few times before the request fails.
+    """
+    return AIORateLimiter(
+        overall_max_rate=TELEGRAM_RATE_LIMIT_OVERALL,
+        overall_time_period=1,
+        group_max_rate=TELEGRAM_RATE_LIMIT_GROUP_PER_MINUTE,
+        group_time_period=60,
+        max_retries=3,
+    )
 
 
 async def main(facade_instance: WasteManagementFacade):
     """Initializes and runs the bot and scheduler."""
-     # Record the bot start time
-    record_bot_start_time(facade_instance)
+    # Record the bot start time
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    record_bot_start_time(facade_instance, started_at)
 
     if not TELEGRAM_BOT_TOKEN:
         logger.error("TELEGRAM_BOT_TOKEN environment variable not set.")
         return
 
-    # Configure rate limiting
-    rate_limiter = AIORateLimiter(
-        overall_max_rate=TELEGRAM_RATE_LIMIT_OVERALL,
-        group_max_rate=TELEGRAM_RATE_LIMIT_GROUP,
-    )
-
     context_types = ContextTypes(context=Context)
-    application = (
+    builder = (
         Application.builder()
         .token(TELEGRAM_BOT_TOKEN)
-        .rate_limiter(rate_limiter)
+        .rate_limiter(build_rate_limiter())
         .context_types(context_types)
-        .build()
     )
+    if BOT_PERSISTENCE_PATH:
+        # Only the per-user conversation state is stored; chat_data holds the
+        # per-chat rate limiters, which are runtime-only.
+        builder = builder.persistence(
+            PicklePersistence(
+                filepath=BOT_PERSISTENCE_PATH,
+                store_data=PersistenceInput(
+                    bot_data=False, chat_data=False, callback_data=False
+                ),
+            )
+        )
+    application = builder.build()
 
     # Set the facade on the application's context
     application.context_types.context.facade = facade_instance
@@ -378,13 +531,13 @@ async def main(facade_instance: WasteManagementFacade):
 
     logger.info("Bot started and polling...")
 
-    # Run the schedulers and bot polling concurrently
+    # Run the schedulers and bot polling concurrently. If either scheduler fails,
+    # the task group cancels the other one before the error propagates.
     try:
-        await asyncio.gather(
-            scheduler(facade_instance, application),
-            facade_instance.smart_schedule_service.run_scheduler(),
-        )
-    except asyncio.CancelledError:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(scheduler(facade_instance, application))
+            tg.create_task(facade_instance.smart_schedule_service.run_scheduler())
+    except* asyncio.CancelledError:
         logger.info("Bot is stopping...")
     finally:
         # Gracefully stop the application
@@ -393,3 +546,4 @@ async def main(facade_instance: WasteManagementFacade):
         if application.running:
             await application.stop()
             await application.shutdown()
+        facade_instance.close()
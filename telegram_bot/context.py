@@ -2,11 +2,29 @@
 This module defines a custom context class for the Telegram bot.
 """
 
+from dataclasses import dataclass
+from typing import Optional
+
 from telegram.ext import CallbackContext, ExtBot
 
 from schedule_parser.facade import WasteManagementFacade
 
 
+# Key under which the ConversationState is stored in context.user_data.
+STATE_KEY = "state"
+
+
+@dataclass(slots=True)
+class ConversationState:
+    """
+    Per-chat state of the subscribe conversation.
+    """
+
+    location_id: Optional[int] = None
+    detected_name: Optional[str] = None
+    final_name: Optional[str] = None
+
+
 class CustomContext(CallbackContext[ExtBot, dict, dict, dict]):
     """
     A custom context class that holds the WasteManagementFacade instance.
@@ -4,93 +4,181 @@ This module handles the scheduling and sending of notifications using the WasteM
 
 import asyncio
 import logging
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
 
+from aiolimiter import AsyncLimiter
 from telegram import Bot
 from telegram.ext import Application
 
+from schedule_parser.config import (EVENING_NOTIFICATION_HOUR,
+                                    MORNING_NOTIFICATION_HOUR,
+                                    NOTIFICATION_CATCH_UP_INTERVAL,
+                                    NOTIFICATION_LOG_BATCH_SIZE,
+                                    NOTIFICATION_SEND_RATE,
+                                    NOTIFICATION_SEND_WORKERS)
 from schedule_parser.facade import WasteManagementFacade
+from schedule_parser.models import NotificationTask
 
 logger = logging.getLogger(__name__)
 
+_NOTIFICATION_WINDOWS = (
+    (MORNING_NOTIFICATION_HOUR, "morning"),
+    (EVENING_NOTIFICATION_HOUR, "evening"),
+)
 
-async def send_notification(bot: Bot, chat_id: int, message: str) -> None:
-    """Sends a single notification message to a user."""
-    await bot.send_message(chat_id=chat_id, text=message)
 
+async def send_notification(
+    bot: Bot, chat_id: int, message: str, limiter: AsyncLimiter
+) -> None:
+    """Sends a single notification message to a user, respecting the send rate."""
+    async with limiter:
+        await bot.send_message(chat_id=chat_id, text=message)
 
-async def check_and_send_notifications(facade: WasteManagementFacade, bot: Bot) -> None:
+
+async def check_and_send_notifications(
+    facade: WasteManagementFacade, bot: Bot, notification_time: Optional[str] = None
+) -> None:
     """
-    Fetches due notifications from the facade and sends them.
+    Fetches due notifications from the facade and sends them. If
+    notification_time is given, only that window's subscribers are checked.
     """
     logger.info("Checking for due notifications...")
-    notification_tasks = facade.get_due_notifications()
+    # The facade's database calls block, so they run in worker threads to keep
+    # the event loop free for incoming updates.
+    notification_tasks = await asyncio.to_thread(
+        facade.get_due_notifications, notification_time
+    )
 
     if not notification_tasks:
         logger.info("No notifications are due.")
         return
 
-    logger.info(f"Found {len(notification_tasks)} notifications to send.")
-
-    # In a real high-volume scenario, you'd use a more robust batching/rate-limiting mechanism.
-    # For this example, asyncio.gather with error handling is sufficient.
-    chunk_size = 30
-    for i in range(0, len(notification_tasks), chunk_size):
-        chunk = notification_tasks[i : i + chunk_size]
-
-        # Log pending notifications and prepare coroutines
-        coroutines = []
-        log_ids = {}  # map coroutine to log_id
-
-        for task in chunk:
-            log_id = facade.log_pending_notification(task["subscription_id"])
-            if log_id:
-                coro = send_notification(bot, task["chat_id"], task["message"])
-                coroutines.append(coro)
-                log_ids[coro] = (
-                    log_id,
-                    task,
-                )  # Store log_id and task for result processing
-
-        # Run send operations concurrently
-        results = await asyncio.gather(*coroutines, return_exceptions=True)
-
-        # Process results and update logs/database
-        for coro, result in zip(coroutines, results):
-            log_id, task_info = log_ids[coro]
-            if not isinstance(result, Exception):
-                facade.update_last_notified_date(
-                    subscription_id=task_info["subscription_id"],
-                    collection_date=task_info["collection_date"],
-                )
-                facade.update_notification_log(log_id, "success")
-                logger.info(
-                    f"Successfully sent notification to chat_id {task_info['chat_id']}."
-                )
-            else:
-                error_message = str(result)
-                facade.update_notification_log(log_id, "failure", error_message)
-                logger.error(
-                    f"Failed to send notification to chat_id {task_info['chat_id']}: {error_message}"
-                )
-
-        # Wait for 1 second before processing the next chunk to respect rate limits
-        if i + chunk_size < len(notification_tasks):
-            await asyncio.sleep(1)
+    logger.info("Found %d notifications to send.", len(notification_tasks))
+
+    # Pending logs for the whole run are written in one transaction; if that
+    # fails nothing is sent, so no notification goes out unlogged.
+    log_ids = await asyncio.to_thread(
+        facade.log_pending_notifications,
+        [task.subscription_id for task in notification_tasks],
+    )
+    if not log_ids:
+        logger.error("Could not log pending notifications; skipping this run.")
+        return
+
+    # Workers send under a token bucket that spreads the sends out to
+    # NOTIFICATION_SEND_RATE per second, while a committer records finished
+    # sends in batches, so database writes overlap with sending.
+    limiter = AsyncLimiter(NOTIFICATION_SEND_RATE, 1)
+    jobs: asyncio.Queue = asyncio.Queue()
+    for job in zip(log_ids, notification_tasks):
+        jobs.put_nowait(job)
+    outcomes: asyncio.Queue = asyncio.Queue()
+
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(_record_outcomes(facade, outcomes))
+        workers = [
+            tg.create_task(_send_worker(bot, jobs, outcomes, limiter))
+            for _ in range(min(NOTIFICATION_SEND_WORKERS, jobs.qsize()))
+        ]
+        await asyncio.gather(*workers)
+        # Tells the committer that no more outcomes will arrive
+        outcomes.put_nowait(None)
+
+
+async def _send_worker(
+    bot: Bot, jobs: asyncio.Queue, outcomes: asyncio.Queue, limiter: AsyncLimiter
+) -> None:
+    """Sends queued notifications until the queue is empty."""
+    while True:
+        try:
+            log_id, task = jobs.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        outcomes.put_nowait(await _send(bot, task, log_id, limiter))
+
+
+async def _record_outcomes(
+    facade: WasteManagementFacade, outcomes: asyncio.Queue
+) -> None:
+    """Records send outcomes in batches until it receives None."""
+    batch = []
+    while (outcome := await outcomes.get()) is not None:
+        batch.append(outcome)
+        if len(batch) >= NOTIFICATION_LOG_BATCH_SIZE:
+            await asyncio.to_thread(facade.finalize_notifications, batch)
+            batch = []
+    if batch:
+        await asyncio.to_thread(facade.finalize_notifications, batch)
+
+
+async def _send(
+    bot: Bot, task: NotificationTask, log_id: int, limiter: AsyncLimiter
+) -> dict:
+    """Sends one notification and returns its outcome for logging."""
+    outcome = {
+        "log_id": log_id,
+        "subscription_id": task.subscription_id,
+        "collection_date": task.collection_date,
+    }
+    try:
+        await send_notification(bot, task.chat_id, task.message, limiter)
+    except Exception as e:
+        error_message = str(e)
+        logger.error(
+            "Failed to send notification to chat_id %s: %s", task.chat_id, error_message
+        )
+        return {**outcome, "status": "failure", "error_message": error_message}
+
+    logger.info("Successfully sent notification to chat_id %s.", task.chat_id)
+    return {**outcome, "status": "success", "error_message": None}
+
+
+def next_notification_window(now: datetime) -> Tuple[float, str]:
+    """
+    Returns the number of seconds from now until the next notification window
+    opens, and that window's notification time ('morning' or 'evening').
+    """
+    next_runs = []
+    for hour, notification_time in _NOTIFICATION_WINDOWS:
+        run_at = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+        if run_at <= now:
+            run_at += timedelta(days=1)
+        next_runs.append((run_at, notification_time))
+    run_at, notification_time = min(next_runs)
+    return (run_at - now).total_seconds(), notification_time
+
+
+def next_scheduler_run(now: datetime) -> Tuple[float, Optional[str]]:
+    """
+    Returns the number of seconds from now until the scheduler should run next,
+    and the notification time to check then. If the next window opens later
+    than NOTIFICATION_CATCH_UP_INTERVAL, a catch-up pass over all due
+    notifications (notification time None) runs in between.
+    """
+    delay, notification_time = next_notification_window(now)
+    if delay > NOTIFICATION_CATCH_UP_INTERVAL:
+        return NOTIFICATION_CATCH_UP_INTERVAL, None
+    return delay, notification_time
 
 
 async def scheduler(facade: WasteManagementFacade, application: Application) -> None:
     """
-    The main scheduler loop that periodically checks for and sends notifications.
+    The main scheduler loop. It checks each window's subscribers when that
+    window opens. On startup, and every NOTIFICATION_CATCH_UP_INTERVAL seconds
+    between windows, it checks all due notifications. This retries failed sends
+    and catches windows missed while the bot was down or subscriptions created
+    after their window opened.
     """
     bot = application.bot
     logger.info("Notification scheduler started.")
+    notification_time = None
     while True:
         try:
-            await check_and_send_notifications(facade, bot)
+            await check_and_send_notifications(facade, bot, notification_time)
         except Exception as e:
             logger.exception(
-                f"An error occurred in the notification scheduler loop: {e}"
+                "An error occurred in the notification scheduler loop: %s", e
             )
-        # Wait for 1 hour before the next check.
-        # In a production environment, this might be a more sophisticated clock-based trigger.
-        await asyncio.sleep(3600)
+        delay, notification_time = next_scheduler_run(datetime.now())
+        await asyncio.sleep(delay)
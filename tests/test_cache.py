@@ -0,0 +1,57 @@
+"""
+Unit tests for the TTLCache.
+"""
+
+from schedule_parser.cache import TTLCache
+
+
+class FakeTimer:
+    """A controllable replacement for time.monotonic."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    """Tests that entries are returned until their TTL has passed."""
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=60, timer=timer)
+    cache.set(1, "Home")
+
+    timer.now = 59
+    assert cache.get(1) == "Home"
+
+    timer.now = 60
+    assert cache.get(1) is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    """Tests that the cache never grows beyond maxsize."""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    cache.get(1)  # 2 is now the least recently used entry
+    cache.set(3, "c")
+
+    assert cache.get(1) == "a"
+    assert cache.get(2) is None
+    assert cache.get(3) == "c"
+
+
+def test_pop_and_clear():
+    """Tests explicit invalidation."""
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set(1, "a")
+    cache.set(2, "b")
+
+    cache.pop(1)
+    cache.pop(99)  # Missing keys are ignored
+    assert cache.get(1) is None
+    assert cache.get(2) == "b"
+
+    cache.clear()
+    assert len(cache) == 0
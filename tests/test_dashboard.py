@@ -2,11 +2,12 @@
 Unit tests for the Flask Dashboard.
 """
 
-from unittest.mock import patch
+from unittest.mock import MagicMock
 
 import pytest
 
 from dashboard.app import app
+from schedule_parser.facade import WasteManagementFacade
 
 # Sample data for mocking the facade's response
 SAMPLE_DATA = {
@@ -34,21 +35,28 @@ EMPTY_DATA = {
 ERROR_DATA = {"error": "Database connection failed."}
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def client():
+    """Returns a test client shared by all dashboard tests."""
     app.config["TESTING"] = True
     with app.test_client() as client:
         yield client
 
 
-def test_dashboard_displays_data(client):
+@pytest.fixture
+def mock_facade(monkeypatch):
+    """Installs a mock facade for the duration of one test."""
+    facade = MagicMock(spec=WasteManagementFacade)
+    monkeypatch.setitem(app.config, "FACADE", facade)
+    return facade
+
+
+def test_dashboard_displays_data(client, mock_facade):
     """
     Tests that the dashboard correctly renders data retrieved from the facade.
     """
     # Arrange
-    mock_facade = patch("schedule_parser.facade.WasteManagementFacade").start()
     mock_facade.get_dashboard_data.return_value = SAMPLE_DATA
-    app.config["FACADE"] = mock_facade
 
     # Act
     response = client.get("/")
@@ -63,17 +71,14 @@ def test_dashboard_displays_data(client):
     assert b"evening" in response.data
     # Check for log data
     assert b"Test log" in response.data
-    patch.stopall()
 
 
-def test_dashboard_handles_empty_data(client):
+def test_dashboard_handles_empty_data(client, mock_facade):
     """
     Tests that the dashboard renders correctly when the facade returns no data.
     """
     # Arrange
-    mock_facade = patch("schedule_parser.facade.WasteManagementFacade").start()
     mock_facade.get_dashboard_data.return_value = EMPTY_DATA
-    app.config["FACADE"] = mock_facade
 
     # Act
     response = client.get("/")
@@ -83,17 +88,14 @@ def test_dashboard_handles_empty_data(client):
     assert b"No events found." in response.data
     assert b"No subscriptions found." in response.data
     assert b"No logs found." in response.data
-    patch.stopall()
 
 
-def test_dashboard_displays_error(client):
+def test_dashboard_displays_error(client, mock_facade):
     """
     Tests that the dashboard displays an error message when the facade returns an error.
     """
     # Arrange
-    mock_facade = patch("schedule_parser.facade.WasteManagementFacade").start()
     mock_facade.get_dashboard_data.return_value = ERROR_DATA
-    app.config["FACADE"] = mock_facade
 
     # Act
     response = client.get("/")
@@ -101,4 +103,17 @@ def test_dashboard_displays_error(client):
     # Assert
     assert response.status_code == 200
     assert b"Database connection failed." in response.data
-    patch.stopall()
+
+
+def test_dashboard_closes_db_connection_after_request(client, mock_facade):
+    """
+    Tests that the request thread's database connection is closed at teardown.
+    """
+    # Arrange
+    mock_facade.get_dashboard_data.return_value = EMPTY_DATA
+
+    # Act
+    client.get("/")
+
+    # Assert
+    mock_facade.close.assert_called()
@@ -134,3 +134,102 @@ def test_subscribe_download_error_is_raised(mock_services):
         facade.subscribe_address_for_user(
             chat_id=999, address_id=123, address_name="Home", notification_time="evening"
         )
+
+
+def test_get_address_by_id_reads_from_the_database(mock_services):
+    """
+    Tests that address lookups go to the persistence service.
+    """
+    # Arrange
+    facade = WasteManagementFacade(**mock_services)
+    mock_persistence_instance = mock_services["persistence_service"].__enter__.return_value
+    mock_persistence_instance.get_address_by_id.return_value = "Home"
+
+    # Act
+    address = facade.get_address_by_id(123)
+
+    # Assert
+    assert address == "Home"
+    mock_persistence_instance.get_address_by_id.assert_called_once_with(123)
+
+
+def test_verify_location_id_caches_successful_lookups(mock_services):
+    """
+    Tests that a verified location is served from the cache, while failed
+    verifications are retried.
+    """
+    facade = WasteManagementFacade(**mock_services)
+    mock_persistence_instance = mock_services["persistence_service"].__enter__.return_value
+    mock_persistence_instance.get_location_name_from_events.return_value = None
+    mock_schedule_service = mock_services["schedule_service"]
+    mock_schedule_service.get_address_from_id.side_effect = [None, "Chemnitzer Straße 42"]
+
+    assert facade.verify_location_id(123) is None
+    assert facade.verify_location_id(123) == "Chemnitzer Straße 42"
+    assert facade.verify_location_id(123) == "Chemnitzer Straße 42"
+
+    assert mock_schedule_service.get_address_from_id.call_count == 2
+
+
+def test_unsubscribe_returns_false_when_nothing_was_removed(mock_services):
+    """Tests that unsubscribing another chat's subscription reports failure."""
+    facade = WasteManagementFacade(**mock_services)
+    mock_subscription_service = mock_services["subscription_service"]
+    mock_subscription_service.remove_subscription.return_value = False
+
+    assert facade.unsubscribe(42, chat_id=999) is False
+    mock_subscription_service.remove_subscription.assert_called_once_with(42, 999)
+
+
+def test_get_next_pickup_for_user(mock_services):
+    """Tests that next pickups come from one query and are split into address and event."""
+    facade = WasteManagementFacade(**mock_services)
+    mock_persistence_instance = mock_services["persistence_service"].__enter__.return_value
+    mock_persistence_instance.get_next_pickups_by_chat_id.return_value = [
+        {"address": "Home", "date": "2023-10-27", "waste_type": "Rest-Tonne"},
+    ]
+
+    pickups = facade.get_next_pickup_for_user(999)
+
+    assert pickups == [
+        {"address": "Home", "event": {"date": "2023-10-27", "waste_type": "Rest-Tonne"}}
+    ]
+    mock_persistence_instance.get_next_pickups_by_chat_id.assert_called_once()
+    mock_services["subscription_service"].get_user_subscriptions.assert_not_called()
+
+
+def test_user_subscriptions_are_cached_until_they_change(mock_services):
+    """Tests that a chat's subscription list is cached and invalidated on changes."""
+    facade = WasteManagementFacade(**mock_services)
+    mock_subscription_service = mock_services["subscription_service"]
+    mock_subscription_service.get_user_subscriptions_with_names.return_value = [
+        {"id": 1, "address": "Home"}
+    ]
+    mock_persistence_instance = mock_services["persistence_service"].__enter__.return_value
+    mock_persistence_instance.check_events_existence.return_value = True
+
+    facade.get_user_subscriptions_with_names(999)
+    facade.get_user_subscriptions_with_names(999)
+    assert mock_subscription_service.get_user_subscriptions_with_names.call_count == 1
+
+    facade.unsubscribe(1, chat_id=999)
+    facade.get_user_subscriptions_with_names(999)
+    assert mock_subscription_service.get_user_subscriptions_with_names.call_count == 2
+
+    facade.subscribe_address_for_user(999, 123, "Home", "evening")
+    facade.get_user_subscriptions_with_names(999)
+    assert mock_subscription_service.get_user_subscriptions_with_names.call_count == 3
+
+
+def test_cached_subscriptions_are_not_shared_between_callers(mock_services):
+    """Tests that changing a returned subscription list leaves the cache intact."""
+    facade = WasteManagementFacade(**mock_services)
+    mock_services["subscription_service"].get_user_subscriptions_with_names.return_value = [
+        {"id": 1, "address": "Home"}
+    ]
+
+    facade.get_user_subscriptions_with_names(999).clear()
+    subscriptions = facade.get_user_subscriptions_with_names(999)
+    subscriptions.append({"id": 2, "address": "Work"})
+
+    assert facade.get_user_subscriptions_with_names(999) == [{"id": 1, "address": "Home"}]
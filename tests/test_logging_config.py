@@ -0,0 +1,75 @@
+"""
+Unit tests for the database logging setup.
+"""
+
+import logging
+import sqlite3
+import threading
+from logging.handlers import QueueHandler
+from unittest.mock import MagicMock
+
+import pytest
+
+from dump_date import logging_config
+from schedule_parser.services.persistence_service import PersistenceService
+
+
+@pytest.fixture
+def restore_root_logger():
+    """Restores the root logger's handlers and level after the test."""
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield
+    logging_config.stop_database_logging()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def test_records_are_written_to_the_database_off_the_calling_thread(
+    tmp_path, restore_root_logger, monkeypatch
+):
+    """Tests that logging only queues records, which a listener writes to the DB."""
+    db_path = str(tmp_path / "logs.db")
+    service = PersistenceService(db_path=db_path)
+    with service:
+        service.init_db()
+    service.close()
+    emitting_threads = []
+    original_emit = logging_config.SQLiteHandler.emit
+
+    def emit(self, record):
+        emitting_threads.append(threading.get_ident())
+        original_emit(self, record)
+
+    monkeypatch.setattr(logging_config.SQLiteHandler, "emit", emit)
+    logging_config.setup_database_logging(db_path)
+    assert [type(h) for h in logging.getLogger().handlers] == [QueueHandler]
+
+    logging.getLogger("test").warning("queued %s", "message")
+    # Stopping drains the queue
+    logging_config.stop_database_logging()
+
+    assert threading.get_ident() not in emitting_threads
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT level, message, logger_name FROM logs").fetchall()
+    conn.close()
+    assert ("WARNING", "test") in [(level, name) for level, _, name in rows]
+    assert any(message.endswith("queued message") for _, message, _ in rows)
+
+
+def test_stop_is_registered_at_exit_once(tmp_path, restore_root_logger, monkeypatch):
+    """Tests that repeated setup does not pile up exit handlers."""
+    register = MagicMock()
+    monkeypatch.setattr(logging_config.atexit, "register", register)
+    monkeypatch.setattr(logging_config, "_stop_registered", False)
+
+    db_path = str(tmp_path / "logs.db")
+    service = PersistenceService(db_path=db_path)
+    with service:
+        service.init_db()
+    service.close()
+
+    logging_config.setup_database_logging(db_path)
+    logging_config.setup_database_logging(db_path)
+
+    register.assert_called_once_with(logging_config.stop_database_logging)
@@ -2,37 +2,24 @@
 Unit tests for the NotificationService.
 """
 
-from datetime import date, datetime
+from datetime import datetime
 from unittest.mock import MagicMock, patch
 
 from schedule_parser.services.notification_service import NotificationService
 
-# Sample data to be returned by the mocked persistence service
-SAMPLE_SUBSCRIPTIONS = [
+# Sample rows as returned by the (already filtering) persistence service
+SAMPLE_PENDING_NOTIFICATIONS = [
     {
-        "id": 1,
+        "subscription_id": 1,
         "chat_id": 101,
-        "address_id": 1,
         "notification_time": "evening",
-        "last_notified": None,
-    },
-    {
-        "id": 2,
-        "chat_id": 102,
-        "address_id": 2,
-        "notification_time": "morning",
-        "last_notified": "2023-10-26",
-    },
-]
-
-SAMPLE_EVENTS = [
-    {
-        "original_address": "Test Straße 1",
         "date": "2023-10-27",
         "waste_type": "Rest-Tonne",
     },  # Tomorrow
     {
-        "original_address": "Musterweg 2",
+        "subscription_id": 2,
+        "chat_id": 102,
+        "notification_time": "morning",
         "date": "2023-10-26",
         "waste_type": "Bio-Tonne",
     },  # Today
@@ -45,21 +32,8 @@ def test_get_due_notifications():
     """
     mock_persistence = MagicMock()
     mock_persistence_instance = mock_persistence.__enter__.return_value
-    mock_persistence_instance.get_all_active_subscriptions.return_value = (
-        SAMPLE_SUBSCRIPTIONS
-    )
-    mock_persistence_instance.get_all_waste_events.return_value = SAMPLE_EVENTS
-
-    # Mock the address lookup
-    def get_address_by_id_side_effect(address_id):
-        if address_id == 1:
-            return "Test Straße 1"
-        if address_id == 2:
-            return "Musterweg 2"
-        return None
-
-    mock_persistence_instance.get_address_by_id.side_effect = (
-        get_address_by_id_side_effect
+    mock_persistence_instance.get_pending_notifications.return_value = (
+        SAMPLE_PENDING_NOTIFICATIONS
     )
 
     service = NotificationService(persistence_service=mock_persistence)
@@ -70,16 +44,85 @@ def test_get_due_notifications():
         "schedule_parser.services.notification_service.datetime"
     ) as mock_datetime:
         mock_datetime.now.return_value = datetime(2023, 10, 26, 19, 5)
-        # To keep date consistent with datetime, we can derive it
-        mock_datetime.today.return_value.date.return_value = date(2023, 10, 26)
 
         due_notifications = service.get_due_notifications()
 
     # Assertions
-    # 1. The "evening" subscription for tomorrow's event should be due.
-    # 2. The "morning" subscription for today's event should NOT be due (it's evening).
-    # 3. The "morning" subscription should not be triggered for the already notified date.
-    assert len(due_notifications) == 1
-    notification = due_notifications[0]
-    assert notification["subscription_id"] == 1
-    assert "für morgen geplant" in notification["message"]
+    # 1. Evening subscribers are queried for tomorrow, morning subscribers for today.
+    # 2. Each returned row becomes a notification with a matching message.
+    mock_persistence_instance.get_pending_notifications.assert_called_once_with(
+        "2023-10-27", "2023-10-26"
+    )
+    assert len(due_notifications) == 2
+    evening, morning = due_notifications
+    assert evening.subscription_id == 1
+    assert "für morgen geplant" in evening.message
+    assert evening.collection_date == "2023-10-27"
+    assert morning.subscription_id == 2
+    assert "wird heute abgeholt" in morning.message
+
+
+def test_get_due_notifications_time_windows():
+    """
+    Tests that evening notifications are only requested from 19:00, and that
+    nothing is queried before 06:00.
+    """
+    mock_persistence = MagicMock()
+    mock_persistence_instance = mock_persistence.__enter__.return_value
+    mock_persistence_instance.get_pending_notifications.return_value = []
+    service = NotificationService(persistence_service=mock_persistence)
+
+    with patch(
+        "schedule_parser.services.notification_service.datetime"
+    ) as mock_datetime:
+        mock_datetime.now.return_value = datetime(2023, 10, 26, 5, 59)
+        assert service.get_due_notifications() == []
+        mock_persistence_instance.get_pending_notifications.assert_not_called()
+
+        mock_datetime.now.return_value = datetime(2023, 10, 26, 12, 0)
+        service.get_due_notifications()
+        mock_persistence_instance.get_pending_notifications.assert_called_once_with(
+            None, "2023-10-26"
+        )
+
+
+def test_finalize_notifications():
+    """
+    Tests that every outcome updates its log, and only delivered notifications
+    update the subscription's last notified date.
+    """
+    mock_persistence = MagicMock()
+    mock_persistence_instance = mock_persistence.__enter__.return_value
+    service = NotificationService(persistence_service=mock_persistence)
+
+    service.finalize_notifications(
+        [
+            {"log_id": 11, "subscription_id": 1, "collection_date": "2023-10-27", "status": "success", "error_message": None},
+            {"log_id": 12, "subscription_id": 2, "collection_date": "2023-10-26", "status": "failure", "error_message": "blocked"},
+        ]
+    )
+
+    mock_persistence_instance.finalize_notifications.assert_called_once_with(
+        [("success", None, 11), ("failure", "blocked", 12)],
+        [("2023-10-27", 1)],
+    )
+
+
+def test_get_due_notifications_for_one_window():
+    """Tests that a window's check only queries that window's subscribers."""
+    mock_persistence = MagicMock()
+    mock_persistence_instance = mock_persistence.__enter__.return_value
+    mock_persistence_instance.get_pending_notifications.return_value = []
+    service = NotificationService(persistence_service=mock_persistence)
+
+    with patch(
+        "schedule_parser.services.notification_service.datetime"
+    ) as mock_datetime:
+        mock_datetime.now.return_value = datetime(2023, 10, 26, 19, 0)
+        service.get_due_notifications("evening")
+        service.get_due_notifications("morning")
+
+    assert mock_persistence_instance.get_pending_notifications.call_args_list == [
+        (("2023-10-27", None),),
+        ((None, "2023-10-26"),),
+    ]
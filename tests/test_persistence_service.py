@@ -2,7 +2,9 @@
 Unit tests for the PersistenceService.
 """
 
+import shutil
 import sqlite3
+import threading
 
 import pytest
 
@@ -10,16 +12,37 @@ from schedule_parser.models import WasteEvent
 from schedule_parser.services.persistence_service import PersistenceService
 
 
-@pytest.fixture
-def temp_main_db(tmp_path):
-    """Creates a temporary main database for testing."""
-    db_path = tmp_path / "test_waste_schedule.db"
+@pytest.fixture(scope="session")
+def db_template(tmp_path_factory):
+    """Creates an initialized database once, to be copied for each test."""
+    db_path = tmp_path_factory.mktemp("template") / "waste_schedule.db"
     service = PersistenceService(db_path=str(db_path))
     with service as p:
         p.init_db()
+    service.close()
+    # The schema is in the WAL file until it is checkpointed into the database
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return db_path
+
+
+@pytest.fixture
+def temp_main_db(tmp_path, db_template):
+    """Creates a temporary main database for testing."""
+    db_path = tmp_path / "test_waste_schedule.db"
+    shutil.copyfile(db_template, db_path)
     return str(db_path)
 
 
+@pytest.fixture
+def service(temp_main_db):
+    """Returns a PersistenceService on the test database, closed afterwards."""
+    service = PersistenceService(db_path=temp_main_db)
+    yield service
+    service.close()
+
+
 def test_init_db_creates_tables(temp_main_db):
     """Tests that all tables are created by init_db."""
     conn = sqlite3.connect(temp_main_db)
@@ -35,48 +58,46 @@ def test_init_db_creates_tables(temp_main_db):
     assert "notification_logs" in tables
 
 
-def test_upsert_event_insert(temp_main_db):
-    """Tests inserting a new event."""
-    service = PersistenceService(db_path=temp_main_db)
-    event = WasteEvent("uid1", "2023-10-27", "loc", "Rest", "", "", "addr", 123)
-
-    with service as p:
-        p.upsert_event(event)
-
+def test_init_db_enables_wal(temp_main_db):
+    """Tests that init_db switches the database to write-ahead logging."""
     conn = sqlite3.connect(temp_main_db)
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM waste_events WHERE uid = 'uid1'")
-    assert cur.fetchone() is not None
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
     conn.close()
+    assert journal_mode == "wal"
 
 
-def test_upsert_event_update(temp_main_db):
-    """Tests updating an existing event."""
-    service = PersistenceService(db_path=temp_main_db)
-    event1 = WasteEvent("uid1", "2023-10-27", "loc", "Rest", "", "", "addr1", 123)
-    event2 = WasteEvent(
-        "uid1", "2023-10-28", "loc", "Bio", "", "", "addr2", 123
-    )  # Same UID, different data
-
+@pytest.mark.parametrize(
+    "events, expected",
+    [
+        # Insert a new event
+        ([WasteEvent("uid1", "2023-10-27", "loc", "Rest", "", "", "addr1", 123)], ("Rest", "addr1")),
+        # Update an existing event: same UID, different data
+        (
+            [
+                WasteEvent("uid1", "2023-10-27", "loc", "Rest", "", "", "addr1", 123),
+                WasteEvent("uid1", "2023-10-28", "loc", "Bio", "", "", "addr2", 123),
+            ],
+            ("Bio", "addr2"),
+        ),
+    ],
+    ids=["insert", "update"],
+)
+def test_upsert_event(service, temp_main_db, events, expected):
+    """Tests that upserting events inserts new ones and updates existing ones."""
     with service as p:
-        p.upsert_event(event1)
-        p.upsert_event(event2)
+        for event in events:
+            p.upsert_event(event)
 
     conn = sqlite3.connect(temp_main_db)
-    cur = conn.cursor()
-    cur.execute(
+    rows = conn.execute(
         "SELECT waste_type, original_address FROM waste_events WHERE uid = 'uid1'"
-    )
-    row = cur.fetchone()
+    ).fetchall()
     conn.close()
-    assert row[0] == "Bio"
-    assert row[1] == "addr2"
+    assert rows == [expected]
 
 
-def test_subscription_workflow(temp_main_db):
+def test_subscription_workflow(service, temp_main_db):
     """Tests the full subscription and notification log workflow."""
-    service = PersistenceService(db_path=temp_main_db)
-
     with service as p:
         # Create
         p.create_subscription(chat_id=123, address_id=456, address_name="Home", notification_time="evening")
@@ -102,8 +123,198 @@ def test_subscription_workflow(temp_main_db):
         assert log_id is not None
         p.update_notification_log_status(log_id, "success")
 
-        conn = sqlite3.connect(temp_main_db)
-        cur = conn.cursor()
-        cur.execute("SELECT status FROM notification_logs WHERE id = ?", (log_id,))
-        assert cur.fetchone()[0] == "success"
-        conn.close()
+    # The status update is committed when the 'with' block exits
+    conn = sqlite3.connect(temp_main_db)
+    cur = conn.cursor()
+    cur.execute("SELECT status FROM notification_logs WHERE id = ?", (log_id,))
+    assert cur.fetchone()[0] == "success"
+    conn.close()
+
+
+def test_failed_block_is_rolled_back(service, temp_main_db):
+    """Tests that an exception inside a 'with' block leaves no rows behind."""
+    with pytest.raises(ValueError):
+        with service as p:
+            p.create_subscription(chat_id=123, address_id=456, address_name="Home", notification_time="evening")
+            raise ValueError("boom")
+
+    conn = sqlite3.connect(temp_main_db)
+    assert conn.execute("SELECT COUNT(*) FROM subscriptions").fetchone()[0] == 0
+    conn.close()
+    # The next block on this thread does not commit the abandoned write either
+    with service as p:
+        p.record_system_info("key", "value")
+    with service as p:
+        assert p.get_subscriptions_by_chat_id(123) == []
+
+
+def test_get_pending_notifications(service):
+    """Tests that due notifications are joined and filtered in SQL."""
+    with service as p:
+        p.upsert_event(WasteEvent("uid1", "2023-10-26", "loc", "Bio-Tonne", "", "", "addr", 1))
+        p.upsert_event(WasteEvent("uid2", "2023-10-27", "loc", "Rest-Tonne", "", "", "addr", 1))
+        p.upsert_event(WasteEvent("uid3", "2023-10-30", "loc", "Papier-Tonne", "", "", "addr", 1))
+        p.create_subscription(chat_id=101, address_id=1, address_name="Home", notification_time="evening")
+        p.create_subscription(chat_id=102, address_id=1, address_name="Home", notification_time="morning")
+        p.create_subscription(chat_id=103, address_id=1, address_name="Home", notification_time="morning")
+        p.create_subscription(chat_id=104, address_id=1, address_name="Home", notification_time="morning")
+        subs = {sub["chat_id"]: sub["id"] for sub in p.get_all_active_subscriptions()}
+        # Already notified about today's collection
+        p.update_subscription_last_notified(subs[102], "2023-10-26")
+        p.deactivate_subscription(subs[103])
+
+        # Evening of Oct 26th: tomorrow for evening, today for morning subscribers
+        rows = p.get_pending_notifications("2023-10-27", "2023-10-26")
+        # Before 19:00 only morning subscribers are due
+        morning_rows = p.get_pending_notifications(None, "2023-10-26")
+
+    pending = {(row["chat_id"], row["date"]) for row in rows}
+    assert pending == {
+        (101, "2023-10-27"),
+        (104, "2023-10-26"),
+    }
+    assert [(row["chat_id"], row["date"]) for row in morning_rows] == [(104, "2023-10-26")]
+
+
+def test_bulk_notification_logging(service, temp_main_db):
+    """Tests that pending logs are created and finalized in bulk."""
+    with service as p:
+        p.create_subscription(chat_id=101, address_id=1, address_name="Home", notification_time="evening")
+        p.create_subscription(chat_id=102, address_id=1, address_name="Home", notification_time="evening")
+        subs = {sub["chat_id"]: sub["id"] for sub in p.get_all_active_subscriptions()}
+
+        log_ids = p.create_pending_notification_logs([subs[101], subs[102], subs[101]])
+        assert len(set(log_ids)) == 3
+
+        p.finalize_notifications(
+            [
+                ("success", None, log_ids[0]),
+                ("failure", "blocked", log_ids[1]),
+                ("success", None, log_ids[2]),
+            ],
+            [("2023-10-27", subs[101])],
+        )
+
+    conn = sqlite3.connect(temp_main_db)
+    logs = conn.execute(
+        "SELECT id, subscription_id, status, error_message FROM notification_logs ORDER BY id"
+    ).fetchall()
+    last_notified = dict(conn.execute("SELECT chat_id, last_notified FROM subscriptions"))
+    conn.close()
+    assert logs == [
+        (log_ids[0], subs[101], "success", None),
+        (log_ids[1], subs[102], "failure", "blocked"),
+        (log_ids[2], subs[101], "success", None),
+    ]
+    assert last_notified == {101: "2023-10-27", 102: None}
+
+
+def test_get_subscriptions_with_names_by_chat_id(service):
+    """Tests that display names are resolved in SQL, including the fallbacks."""
+    with service as p:
+        p.create_subscription(chat_id=101, address_id=1, address_name="Home", notification_time="evening")
+        p.create_subscription(chat_id=101, address_id=2, address_name=None, notification_time="morning")
+        p.create_subscription(chat_id=101, address_id=3, address_name=None, notification_time="morning")
+        p.create_subscription(chat_id=102, address_id=2, address_name="Work", notification_time="morning")
+
+        subs = p.get_subscriptions_with_names_by_chat_id(101)
+
+    assert {sub["address_id"]: sub["address"] for sub in subs} == {
+        1: "Home",
+        2: "Work",
+        3: "Location 3",
+    }
+
+
+def test_deactivate_subscription_scoped_to_chat(service):
+    """Tests that a chat cannot deactivate another chat's subscription."""
+    with service as p:
+        p.create_subscription(chat_id=101, address_id=1, address_name="Home", notification_time="evening")
+        sub_id = p.get_subscriptions_by_chat_id(101)[0]["id"]
+
+        assert p.deactivate_subscription(sub_id, chat_id=102) is False
+        assert len(p.get_subscriptions_by_chat_id(101)) == 1
+
+        assert p.deactivate_subscription(sub_id, chat_id=101) is True
+        assert p.get_subscriptions_by_chat_id(101) == []
+
+
+def test_record_system_info_outside_with_block(service, temp_main_db):
+    """Tests that record_system_info opens its own connection after a prior 'with' block."""
+    with service as p:
+        p.get_all_active_subscriptions()
+
+    service.record_system_info("bot_start_time", "2023-10-26T08:00:00")
+
+    conn = sqlite3.connect(temp_main_db)
+    cur = conn.cursor()
+    cur.execute("SELECT value FROM system_info WHERE key = 'bot_start_time'")
+    assert cur.fetchone()[0] == "2023-10-26T08:00:00"
+    conn.close()
+
+
+def test_connection_state_is_per_thread(service):
+    """Tests that a 'with' block in one thread does not expose its connection to others."""
+    seen_in_thread = []
+
+    with service as p:
+        thread = threading.Thread(target=lambda: seen_in_thread.append(service._conn))
+        thread.start()
+        thread.join()
+        assert p._conn is not None
+
+    assert seen_in_thread == [None]
+
+
+def test_get_next_pickups_by_chat_id(service):
+    """Tests that only the earliest upcoming event per subscription is returned."""
+    with service as p:
+        p.upsert_event(WasteEvent("uid1", "2023-10-20", "loc", "Bio-Tonne", "", "", "addr", 1))
+        p.upsert_event(WasteEvent("uid2", "2023-10-30", "loc", "Papier-Tonne", "", "", "addr", 1))
+        p.upsert_event(WasteEvent("uid3", "2023-10-27", "loc", "Rest-Tonne", "", "", "addr", 1))
+        p.upsert_event(WasteEvent("uid4", "2023-11-02", "loc", "Gelbe Tonne", "", "", "addr", 2))
+        p.upsert_event(WasteEvent("uid5", "2023-10-01", "loc", "Bio-Tonne", "", "", "addr", 3))
+        p.create_subscription(chat_id=101, address_id=1, address_name="Home", notification_time="evening")
+        p.create_subscription(chat_id=101, address_id=2, address_name=None, notification_time="morning")
+        p.create_subscription(chat_id=101, address_id=3, address_name="Past only", notification_time="morning")
+        p.create_subscription(chat_id=102, address_id=1, address_name="Other", notification_time="morning")
+
+        rows = p.get_next_pickups_by_chat_id(101, "2023-10-26")
+
+    assert [(row["address"], row["waste_type"], row["date"]) for row in rows] == [
+        ("Home", "Rest-Tonne", "2023-10-27"),
+        ("Location 2", "Gelbe Tonne", "2023-11-02"),
+    ]
+
+
+def test_connection_is_reused_across_with_blocks(service):
+    """Tests that a thread keeps its connection and nested blocks commit once, at the end."""
+    with service as p:
+        first_conn = p._conn
+    with service as p:
+        assert p._conn is first_conn
+        with service as inner:
+            inner.create_subscription(chat_id=101, address_id=1, address_name="Home", notification_time="evening")
+        # The inner block joined the outer unit of work and did not commit yet
+        assert p._get_cursor() is not None
+        assert first_conn.in_transaction
+
+    assert not first_conn.in_transaction
+    with pytest.raises(RuntimeError):
+        service._get_cursor()
+
+
+def test_close_drops_the_thread_connection(service):
+    """Tests that close() closes this thread's connection and a later block reopens one."""
+    with service as p:
+        first_conn = p._conn
+        with pytest.raises(RuntimeError):
+            service.close()
+
+    service.close()
+
+    assert service._conn is None
+    with pytest.raises(sqlite3.ProgrammingError):
+        first_conn.execute("SELECT 1")
+    with service as p:
+        assert p.get_all_active_subscriptions() == []
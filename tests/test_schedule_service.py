@@ -3,7 +3,8 @@ Unit tests for the ScheduleService.
 """
 
 from datetime import date
-from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+from unittest.mock import patch
 
 import pytest
 import requests
@@ -39,17 +40,33 @@ END:VCALENDAR
 """
 
 
+@pytest.fixture(autouse=True)
+def retry_sleeps(monkeypatch):
+    """Records the service's retry waits instead of sleeping through them."""
+    sleeps = []
+    monkeypatch.setattr(
+        "schedule_parser.services.schedule_service.time.sleep", sleeps.append
+    )
+    return sleeps
+
+
+def _response(text: str = "", error: Exception = None) -> SimpleNamespace:
+    """Returns a minimal stand-in for a requests.Response."""
+
+    def raise_for_status():
+        if error is not None:
+            raise error
+
+    return SimpleNamespace(text=text, raise_for_status=raise_for_status)
+
+
 @patch("schedule_parser.services.schedule_service.requests.get")
 def test_download_and_parse_success(mock_requests_get):
     """
     Tests the successful download and parsing of a schedule.
     """
     # Arrange
-    mock_response = MagicMock()
-    mock_response.status_code = 200
-    mock_response.text = SAMPLE_ICS_CONTENT
-    mock_response.raise_for_status.return_value = None
-    mock_requests_get.return_value = mock_response
+    mock_requests_get.return_value = _response(SAMPLE_ICS_CONTENT)
 
     service = ScheduleService()
 
@@ -70,7 +87,7 @@ def test_download_and_parse_success(mock_requests_get):
 
 
 @patch("schedule_parser.services.schedule_service.requests.get")
-def test_download_failure_raises_download_error(mock_requests_get):
+def test_download_failure_raises_download_error(mock_requests_get, retry_sleeps):
     """
     Tests that a DownloadError is raised after retries on network failure.
     """
@@ -78,7 +95,6 @@ def test_download_failure_raises_download_error(mock_requests_get):
     mock_requests_get.side_effect = requests.exceptions.RequestException(
         "Network error"
     )
-    # Make retries fast for the test
     service = ScheduleService(max_retries=2, retry_delay=0.1)
 
     # Act & Assert
@@ -90,6 +106,9 @@ def test_download_failure_raises_download_error(mock_requests_get):
             original_address="Test Straße 1",
         )
     assert mock_requests_get.call_count == 2
+    # One wait between the two attempts: retry_delay plus up to a second of jitter
+    assert len(retry_sleeps) == 1
+    assert 0.1 <= retry_sleeps[0] <= 1.1
 
 
 @patch("schedule_parser.services.schedule_service.requests.get")
@@ -98,13 +117,9 @@ def test_download_http_error_raises_download_error(mock_requests_get):
     Tests that a DownloadError is raised after retries on HTTP error.
     """
     # Arrange
-    mock_response = MagicMock()
-    mock_response.status_code = 404
-    mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(
-        "Not Found"
+    mock_requests_get.return_value = _response(
+        error=requests.exceptions.HTTPError("Not Found")
     )
-    mock_requests_get.return_value = mock_response
-    # Make retries fast for the test
     service = ScheduleService(max_retries=2, retry_delay=0.1)
 
     # Act & Assert
@@ -124,9 +139,7 @@ def test_invalid_content_raises_download_error(mock_requests_get):
     Tests that a DownloadError is raised for content that is not an ICS file.
     """
     # Arrange
-    mock_response = MagicMock()
-    mock_response.text = "INVALID ICS CONTENT"
-    mock_requests_get.return_value = mock_response
+    mock_requests_get.return_value = _response("INVALID ICS CONTENT")
 
     service = ScheduleService()
 
@@ -146,10 +159,8 @@ def test_malformed_ical_raises_parsing_error(mock_requests_get):
     Tests that a ParsingError is raised for malformed ICS content.
     """
     # Arrange
-    mock_response = MagicMock()
     # Passes the BEGIN:VCALENDAR check but fails parsing
-    mock_response.text = "BEGIN:VCALENDAR\nINVALID LINE"
-    mock_requests_get.return_value = mock_response
+    mock_requests_get.return_value = _response("BEGIN:VCALENDAR\nINVALID LINE")
 
     service = ScheduleService()
 
@@ -169,9 +180,7 @@ def test_empty_ics_file(mock_requests_get):
     Tests that an empty list is returned for a valid but empty ICS file.
     """
     # Arrange
-    mock_response = MagicMock()
-    mock_response.text = EMPTY_ICS_CONTENT
-    mock_requests_get.return_value = mock_response
+    mock_requests_get.return_value = _response(EMPTY_ICS_CONTENT)
 
     service = ScheduleService()
 
@@ -193,9 +202,7 @@ def test_ics_file_with_invalid_event(mock_requests_get):
     Tests that an event is skipped if it is missing the DTSTART field.
     """
     # Arrange
-    mock_response = MagicMock()
-    mock_response.text = INVALID_EVENT_ICS_CONTENT
-    mock_requests_get.return_value = mock_response
+    mock_requests_get.return_value = _response(INVALID_EVENT_ICS_CONTENT)
 
     service = ScheduleService()
 
@@ -209,3 +216,17 @@ def test_ics_file_with_invalid_event(mock_requests_get):
 
     # Assert
     assert len(events) == 0
+
+
+def test_retry_delay_uses_capped_exponential_backoff():
+    """
+    Tests that the retry delay grows exponentially up to retry_delay and keeps
+    its jitter once capped.
+    """
+    service = ScheduleService(retry_delay=10)
+
+    assert 1 <= service._get_retry_delay(0) <= 2
+    assert 2 <= service._get_retry_delay(1) <= 3
+    assert 4 <= service._get_retry_delay(2) <= 5
+    with patch("schedule_parser.services.schedule_service.random.uniform", return_value=0.5):
+        assert service._get_retry_delay(10) == 10.5
@@ -2,22 +2,23 @@
 Unit tests for the SmartScheduleService.
 """
 
+import threading
 from datetime import date, timedelta
-from unittest.mock import MagicMock, Mock, patch
+from unittest.mock import MagicMock
 
 import pytest
 
+from schedule_parser.exceptions import DownloadError
 from schedule_parser.models import WasteEvent
 from schedule_parser.services.smart_schedule_service import \
     SmartScheduleService
 
 
-class MockDate(date):
-    """A mock date class to override today() within the class under test."""
-
-    @classmethod
-    def today(cls):
-        return cls._today
+# Dates for the sample events, built once at import
+TODAY = date(2023, 12, 31)
+NEW_YEARS_DAY = date(2024, 1, 1)
+PAST_ISO = (TODAY - timedelta(days=1)).isoformat()
+VALID_ISO = (TODAY + timedelta(days=2)).isoformat()
 
 
 @pytest.fixture
@@ -36,128 +37,171 @@ def mock_schedule_service():
     return MagicMock()
 
 
-class TestSmartScheduleService:
-    """Tests for the SmartScheduleService class."""
+@pytest.fixture
+def freeze_today(monkeypatch):
+    """Returns a function that pins date.today() within the service."""
 
-    def setup_method(self):
-        """Setup method called before each test."""
-        self.persistence_service = MagicMock()
-        self.schedule_service = MagicMock()
-        # Mock context manager for persistence service
-        self.persistence_service.__enter__.return_value = self.persistence_service
-        self.persistence_service.__exit__.return_value = None
+    def freeze(today):
+        class FrozenDate(date):
+            @classmethod
+            def today(cls):
+                return today
 
-        self.service = SmartScheduleService(
-            self.persistence_service, self.schedule_service
+        monkeypatch.setattr(
+            "schedule_parser.services.smart_schedule_service.date", FrozenDate
         )
 
-    @patch("schedule_parser.services.smart_schedule_service.date", MockDate)
-    def test_update_all_schedules_with_locations(self):
-        """
-        Test the successful update of schedules for subscribed locations.
-        """
-        MockDate.today = classmethod(lambda cls: date(2024, 1, 1))
-
-        locations = [
-            {"address_id": 1, "address": "Address 1"},
-            {"address_id": 2, "address": "Address 2"},
-        ]
-        events = [
-            WasteEvent(
-                uid="1",
-                date=(date(2024, 1, 2)).isoformat(),
-                location="Location 1",
-                waste_type="Bio-Tonne",
-                contact_name="Contact",
-                contact_phone="12345",
-                original_address="Address 1",
-                address_id=1
-            )
-        ]
-
-        self.persistence_service.get_unique_subscribed_locations.return_value = (
-            locations
-        )
-        self.schedule_service.download_and_parse_schedule.return_value = events
-
-        self.service.update_all_schedules()
-
-        # Check if locations were fetched
-        self.persistence_service.get_unique_subscribed_locations.assert_called_once()
-        # Check if download was called for each location (2 times)
-        assert self.schedule_service.download_and_parse_schedule.call_count == 2
-        # Check if upsert was called
-        self.persistence_service.upsert_event.assert_called()
-
-    @patch("schedule_parser.services.smart_schedule_service.date", MockDate)
-    def test_update_all_schedules_filters_holidays_and_past_dates(self):
-        """
-        Test that the service correctly filters out holidays and past dates.
-        """
-        today = date(2023, 12, 31)
-        MockDate.today = classmethod(lambda cls: today)
-
-        locations = [{"address_id": 1, "address": "Test Address"}]
-        self.persistence_service.get_unique_subscribed_locations.return_value = (
-            locations
-        )
+    return freeze
+
 
-        events = [
-            WasteEvent(
-                uid="past",
-                date=(today - timedelta(days=1)).isoformat(),
-                location="L",
-                waste_type="W",
-                contact_name="C",
-                contact_phone="P",
-                original_address="A",
-                address_id=1
-            ),
-            WasteEvent(
-                uid="holiday",
-                date=date(2024, 1, 1).isoformat(),
-                location="L",
-                waste_type="W",
-                contact_name="C",
-                contact_phone="P",
-                original_address="A",
-                address_id=1
-            ),  # New Year's Day
-            WasteEvent(
-                uid="valid",
-                date=(today + timedelta(days=2)).isoformat(),
-                location="L",
-                waste_type="W",
-                contact_name="C",
-                contact_phone="P",
-                original_address="A",
-                address_id=1
-            ),
-        ]
-
-        self.schedule_service.download_and_parse_schedule.return_value = events
-
-        self.service.update_all_schedules()
-
-        # Should only upsert the valid event
-        # (past is filtered by code? No, past events are usually kept if recent, but let's see implementation)
-        # Wait, SmartScheduleService calls _filter_and_store_events.
-        # Let's check logic: if event.date < today -> skip. if holiday -> skip.
-        # "past" event date is yesterday -> skip.
-        # "holiday" event date is Jan 1st -> skip (New Year).
-        # "valid" event date is Jan 2nd -> keep.
-
-        # So only 1 upsert expected.
-        assert self.persistence_service.upsert_event.call_count == 1
-        args, _ = self.persistence_service.upsert_event.call_args
-        assert args[0].uid == "valid"
-
-    def test_update_all_schedules_no_subscriptions(self):
-        """
-        Test that nothing happens if there are no subscribed locations.
-        """
-        self.persistence_service.get_unique_subscribed_locations.return_value = []
-
-        self.service.update_all_schedules()
-
-        self.schedule_service.download_and_parse_schedule.assert_not_called()
+@pytest.fixture
+def smart_schedule_service(mock_persistence_service, mock_schedule_service):
+    """Fixture for a SmartScheduleService wired to the mocked services."""
+    return SmartScheduleService(mock_persistence_service, mock_schedule_service)
+
+
+@pytest.fixture(scope="module")
+def sample_events():
+    """
+    Events around the turn of 2024: one in the past, one on New Year's Day and
+    one valid. The service only reads them, so they are built once per module.
+    """
+    return (
+        WasteEvent(
+            uid="past",
+            date=PAST_ISO,
+            location="L",
+            waste_type="W",
+            contact_name="C",
+            contact_phone="P",
+            original_address="A",
+            address_id=1
+        ),
+        WasteEvent(
+            uid="holiday",
+            date=NEW_YEARS_DAY.isoformat(),
+            location="L",
+            waste_type="W",
+            contact_name="C",
+            contact_phone="P",
+            original_address="A",
+            address_id=1
+        ),  # New Year's Day
+        WasteEvent(
+            uid="valid",
+            date=VALID_ISO,
+            location="L",
+            waste_type="W",
+            contact_name="C",
+            contact_phone="P",
+            original_address="A",
+            address_id=1
+        ),
+    )
+
+
+def test_update_all_schedules_with_locations(
+    smart_schedule_service,
+    mock_persistence_service,
+    mock_schedule_service,
+    sample_events,
+    freeze_today,
+):
+    """
+    Test the successful update of schedules for subscribed locations.
+    """
+    freeze_today(NEW_YEARS_DAY)
+    locations = [
+        {"address_id": 1, "address": "Address 1"},
+        {"address_id": 2, "address": "Address 2"},
+    ]
+    mock_persistence_service.get_unique_subscribed_locations.return_value = locations
+    mock_schedule_service.download_and_parse_schedule.return_value = list(
+        sample_events
+    )
+
+    smart_schedule_service.update_all_schedules()
+
+    # Check if locations were fetched
+    mock_persistence_service.get_unique_subscribed_locations.assert_called_once()
+    # Check if download was called for each location (2 times)
+    assert mock_schedule_service.download_and_parse_schedule.call_count == 2
+    # Check if upsert was called
+    mock_persistence_service.upsert_event.assert_called()
+
+
+def test_update_all_schedules_filters_holidays_and_past_dates(
+    smart_schedule_service,
+    mock_persistence_service,
+    mock_schedule_service,
+    sample_events,
+    freeze_today,
+):
+    """
+    Test that the service correctly filters out holidays and past dates.
+    """
+    freeze_today(TODAY)
+    locations = [{"address_id": 1, "address": "Test Address"}]
+    mock_persistence_service.get_unique_subscribed_locations.return_value = locations
+
+    mock_schedule_service.download_and_parse_schedule.return_value = list(
+        sample_events
+    )
+
+    smart_schedule_service.update_all_schedules()
+
+    # The past event and New Year's Day are filtered out; only the valid one is stored
+    assert mock_persistence_service.upsert_event.call_count == 1
+    args, _ = mock_persistence_service.upsert_event.call_args
+    assert args[0].uid == "valid"
+
+
+def test_update_all_schedules_no_subscriptions(
+    smart_schedule_service, mock_persistence_service, mock_schedule_service
+):
+    """
+    Test that nothing happens if there are no subscribed locations.
+    """
+    mock_persistence_service.get_unique_subscribed_locations.return_value = []
+
+    smart_schedule_service.update_all_schedules()
+
+    mock_schedule_service.download_and_parse_schedule.assert_not_called()
+
+
+def test_update_all_schedules_downloads_locations_in_parallel(
+    smart_schedule_service,
+    mock_persistence_service,
+    mock_schedule_service,
+    sample_events,
+    freeze_today,
+    monkeypatch,
+):
+    """
+    Test that locations are downloaded concurrently, and that a failed download
+    does not keep the other locations from being stored.
+    """
+    freeze_today(TODAY)
+    workers = 3
+    monkeypatch.setattr(
+        "schedule_parser.services.smart_schedule_service.SCHEDULE_DOWNLOAD_WORKERS",
+        workers,
+    )
+    mock_persistence_service.get_unique_subscribed_locations.return_value = [
+        {"address_id": i, "address": f"Address {i}"}
+        for i in range(1, workers + 1)
+    ]
+    # Each download waits until all of them have started
+    barrier = threading.Barrier(workers, timeout=5)
+
+    def download(standort_id, start_date, end_date, original_address):
+        barrier.wait()
+        if standort_id == 2:
+            raise DownloadError("Server unavailable")
+        return list(sample_events)
+
+    mock_schedule_service.download_and_parse_schedule.side_effect = download
+
+    smart_schedule_service.update_all_schedules()
+
+    assert mock_persistence_service.upsert_event.call_count == workers - 1
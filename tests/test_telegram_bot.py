@@ -2,24 +2,38 @@
 Unit tests for the Telegram bot logic.
 """
 
-from unittest.mock import ANY, AsyncMock, MagicMock, patch
+import asyncio
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
-from telegram import Chat, Message, Update, User
-from telegram.ext import ContextTypes
+from telegram import CallbackQuery, Chat, InlineKeyboardMarkup, Message, Update, User
+from telegram.ext import (Application, ApplicationHandlerStop, CommandHandler,
+                          ContextTypes, ConversationHandler, PicklePersistence,
+                          filters)
 
 from telegram_bot.bot import (
     LOCATION_ID,
     NAME_CHOICE,
     CUSTOM_NAME,
     NOTIFICATION_TIME,
+    _TIME_KEYBOARD,
+    build_rate_limiter,
+    enforce_chat_rate_limit,
+    handle_expired_menu,
     handle_location_id_input,
     handle_name_choice,
     handle_custom_name,
+    handle_unsubscribe_choice,
+    my_subscriptions,
+    next_pickup,
     set_notification_time,
+    setup_handlers,
     start,
     subscribe,
+    unsubscribe,
 )
+from telegram_bot.context import STATE_KEY, ConversationState
 
 # Mock constants
 CHAT_ID = 12345
@@ -28,13 +42,23 @@ USERNAME = "testuser"
 TEST_ADDRESS_ID = 54367
 TEST_ADDRESS_NAME = "Chemnitzer Straße 42"
 
+# Specs are passed to MagicMock as attribute lists, built once here; passing
+# the classes would make every mock inspect each attribute again. Update mocks
+# keep their class spec, as the bot checks isinstance(update, Update).
+_MESSAGE_SPEC = dir(Message)
+_USER_SPEC = dir(User)
+_CHAT_SPEC = dir(Chat)
+_CALLBACK_QUERY_SPEC = dir(CallbackQuery)
+_CONTEXT_SPEC = dir(ContextTypes.DEFAULT_TYPE)
+
+
 @pytest.fixture
 def update():
     """Creates a mock Update object."""
     update = MagicMock(spec=Update)
-    update.message = MagicMock(spec=Message)
+    update.message = MagicMock(spec=_MESSAGE_SPEC)
     update.message.chat_id = CHAT_ID
-    update.message.from_user = MagicMock(spec=User)
+    update.message.from_user = MagicMock(spec=_USER_SPEC)
     update.message.from_user.id = USER_ID
     update.message.from_user.username = USERNAME
     update.message.reply_text = AsyncMock()
@@ -44,13 +68,12 @@ def update():
 @pytest.fixture
 def context():
     """Creates a mock Context object with the facade."""
-    context = MagicMock(spec=ContextTypes.DEFAULT_TYPE)
+    context = MagicMock(spec=_CONTEXT_SPEC)
     context.user_data = {}
     context.facade = MagicMock()
     return context
 
 
-@pytest.mark.asyncio
 async def test_start(update, context):
     """Tests the start command."""
     await start(update, context)
@@ -58,16 +81,15 @@ async def test_start(update, context):
     assert "DumpDate-Bot" in update.message.reply_text.call_args[0][0]
 
 
-@pytest.mark.asyncio
 async def test_subscribe_starts_conversation(update, context):
     """Tests that /subscribe starts the conversation and asks for Location ID."""
     state = await subscribe(update, context)
     assert state == LOCATION_ID
+    assert context.user_data[STATE_KEY] == ConversationState()
     update.message.reply_text.assert_called_once()
     assert "Standort-ID" in update.message.reply_text.call_args[0][0]
 
 
-@pytest.mark.asyncio
 async def test_handle_location_id_valid(update, context):
     """Tests handling a valid location ID input."""
     update.message.text = str(TEST_ADDRESS_ID)
@@ -77,26 +99,54 @@ async def test_handle_location_id_valid(update, context):
 
     assert state == NAME_CHOICE
     context.facade.verify_location_id.assert_called_once_with(TEST_ADDRESS_ID)
-    assert context.user_data["selected_location_id"] == TEST_ADDRESS_ID
-    assert context.user_data["detected_address_name"] == TEST_ADDRESS_NAME
+    assert context.user_data[STATE_KEY].location_id == TEST_ADDRESS_ID
+    assert context.user_data[STATE_KEY].detected_name == TEST_ADDRESS_NAME
     # Verify it asks for confirmation
     args = update.message.reply_text.call_args_list[-1]
     assert TEST_ADDRESS_NAME in args[0][0]
     assert "Möchtest du diesen Namen behalten?" in args[0][0]
 
 
-@pytest.mark.asyncio
-async def test_handle_location_id_invalid_number(update, context):
-    """Tests handling an invalid (non-numeric) location ID."""
-    update.message.text = "invalid-id"
+async def test_concurrent_location_id_verifications_are_coalesced(context):
+    """Tests that simultaneous inputs of the same ID trigger only one verification."""
+    release = threading.Event()
+
+    def slow_verify(location_id):
+        release.wait(timeout=5)
+        return TEST_ADDRESS_NAME
+
+    context.facade.verify_location_id.side_effect = slow_verify
+    updates = []
+    for _ in range(3):
+        update = MagicMock(spec=Update)
+        update.message = MagicMock(spec=_MESSAGE_SPEC)
+        update.message.text = str(TEST_ADDRESS_ID)
+        update.message.reply_text = AsyncMock()
+        updates.append(update)
+
+    handlers = asyncio.gather(
+        *(handle_location_id_input(update, context) for update in updates)
+    )
+    await asyncio.sleep(0.05)
+    release.set()
+    states = await handlers
+
+    assert states == [NAME_CHOICE] * 3
+    context.facade.verify_location_id.assert_called_once_with(TEST_ADDRESS_ID)
+
+
+@pytest.mark.parametrize("text", ["invalid-id", "", "0", "-5", "²", "12345678901"])
+async def test_handle_location_id_rejects_invalid_numbers(update, context, text):
+    """Tests that only short, positive integers are accepted as location IDs."""
+    update.message.text = text
 
     state = await handle_location_id_input(update, context)
 
     assert state == LOCATION_ID
+    context.facade.verify_location_id.assert_not_called()
     update.message.reply_text.assert_called_with("Bitte gib eine gültige Zahl als Standort-ID ein.")
 
 
-@pytest.mark.asyncio
 async def test_handle_location_id_not_found(update, context):
     """Tests handling a valid number but invalid ID (not found)."""
     update.message.text = "99999"
@@ -109,28 +159,28 @@ async def test_handle_location_id_not_found(update, context):
     assert "nicht verifiziert werden" in update.message.reply_text.call_args_list[-1][0][0]
 
 
-@pytest.mark.asyncio
 async def test_handle_name_choice_keep(update, context):
     """Tests choosing to keep the detected name."""
     update.message.text = "Ja, behalten"
-    context.user_data["selected_location_id"] = TEST_ADDRESS_ID
-    context.user_data["detected_address_name"] = TEST_ADDRESS_NAME
+    context.user_data[STATE_KEY] = ConversationState(
+        location_id=TEST_ADDRESS_ID, detected_name=TEST_ADDRESS_NAME
+    )
 
     state = await handle_name_choice(update, context)
 
     assert state == NOTIFICATION_TIME
-    assert context.user_data["final_address_name"] == TEST_ADDRESS_NAME
+    assert context.user_data[STATE_KEY].final_name == TEST_ADDRESS_NAME
     update.message.reply_text.assert_called_with(
         "Wann möchtest du benachrichtigt werden?",
-        reply_markup=ANY
+        reply_markup=_TIME_KEYBOARD
     )
 
-@pytest.mark.asyncio
 async def test_handle_name_choice_change(update, context):
     """Tests choosing to change the name."""
     update.message.text = "Nein, ändern"
-    context.user_data["selected_location_id"] = TEST_ADDRESS_ID
-    context.user_data["detected_address_name"] = TEST_ADDRESS_NAME
+    context.user_data[STATE_KEY] = ConversationState(
+        location_id=TEST_ADDRESS_ID, detected_name=TEST_ADDRESS_NAME
+    )
 
     state = await handle_name_choice(update, context)
 
@@ -139,7 +189,6 @@ async def test_handle_name_choice_change(update, context):
     assert "gewünschten Namen" in update.message.reply_text.call_args[0][0]
 
 
-@pytest.mark.asyncio
 async def test_handle_custom_name(update, context):
     """Tests entering a custom name."""
     update.message.text = "My Custom Home"
@@ -147,26 +196,265 @@ async def test_handle_custom_name(update, context):
     state = await handle_custom_name(update, context)
 
     assert state == NOTIFICATION_TIME
-    assert context.user_data["final_address_name"] == "My Custom Home"
-
-
-@pytest.mark.asyncio
-async def test_set_notification_time_success(update, context):
-    """Tests setting the notification time and finalizing subscription."""
-    update.message.text = "Abend vorher (19 Uhr)"
-    context.user_data["selected_location_id"] = TEST_ADDRESS_ID
-    context.user_data["final_address_name"] = TEST_ADDRESS_NAME
+    assert context.user_data[STATE_KEY].final_name == "My Custom Home"
+
+
+@pytest.mark.parametrize("notification_time", ["evening", "morning"])
+async def test_set_notification_time_success(update, context, notification_time):
+    """Tests choosing a notification time button and finalizing subscription."""
+    update.callback_query = MagicMock(spec=_CALLBACK_QUERY_SPEC)
+    update.callback_query.data = f"time:{notification_time}"
+    update.callback_query.answer = AsyncMock()
+    update.callback_query.edit_message_text = AsyncMock()
+    update.callback_query.message = update.message
+    context.user_data[STATE_KEY] = ConversationState(
+        location_id=TEST_ADDRESS_ID, final_name=TEST_ADDRESS_NAME
+    )
     context.facade.subscribe_address_for_user.return_value = True
 
-    from telegram.ext import ConversationHandler
     state = await set_notification_time(update, context)
 
     assert state == ConversationHandler.END
+    update.callback_query.answer.assert_awaited_once()
+    update.callback_query.edit_message_text.assert_awaited_once()
     context.facade.subscribe_address_for_user.assert_called_once_with(
         chat_id=CHAT_ID,
         address_id=TEST_ADDRESS_ID,
         address_name=TEST_ADDRESS_NAME,
-        notification_time="evening"
+        notification_time=notification_time
     )
     assert "erfolgreich eingerichtet" in update.message.reply_text.call_args_list[-1][0][0]
     assert len(context.user_data) == 0  # cleared
+
+
+def test_notification_time_buttons_match_their_handler():
+    """Tests that both notification time buttons are routed to set_notification_time."""
+    application = MagicMock()
+    application.persistence = None
+
+    setup_handlers(application)
+
+    conv = next(
+        call.args[0]
+        for call in application.add_handler.call_args_list
+        if isinstance(call.args[0], ConversationHandler)
+    )
+    callback_handler = conv.states[NOTIFICATION_TIME][0]
+    buttons = [button for row in _TIME_KEYBOARD.inline_keyboard for button in row]
+    assert [button.callback_data for button in buttons] == ["time:evening", "time:morning"]
+    for button in buttons:
+        assert callback_handler.pattern.match(button.callback_data)
+    assert callback_handler.callback is set_notification_time
+
+
+async def test_my_subscriptions_lists_resolved_names(update, context):
+    """Tests that /mysubscriptions uses the names resolved by the facade."""
+    context.facade.get_user_subscriptions_with_names.return_value = [
+        {"id": 1, "address_id": 10, "address_name": None, "address": "Location 10", "notification_time": "evening"},
+        {"id": 2, "address_id": 20, "address_name": "Work", "address": "Work", "notification_time": "morning"},
+    ]
+
+    await my_subscriptions(update, context)
+
+    context.facade.get_user_subscriptions_with_names.assert_called_once_with(CHAT_ID)
+    context.facade.get_address_by_id.assert_not_called()
+    message = update.message.reply_text.call_args[0][0]
+    assert "Location 10 (Abend vorher)" in message
+    assert "Work (Morgen der Abholung)" in message
+
+
+async def test_unsubscribe_offers_inline_buttons(update, context):
+    """Tests that /unsubscribe sends one inline button per subscription."""
+    context.facade.get_user_subscriptions_with_names.return_value = [
+        {"id": 1, "address_id": 10, "address_name": None, "address": "Location 10", "notification_time": "evening"},
+        {"id": 2, "address_id": 20, "address_name": "Work", "address": "Work", "notification_time": "morning"},
+    ]
+
+    await unsubscribe(update, context)
+
+    markup = update.message.reply_text.call_args.kwargs["reply_markup"]
+    assert isinstance(markup, InlineKeyboardMarkup)
+    buttons = [row[0] for row in markup.inline_keyboard]
+    assert [(b.text, b.callback_data) for b in buttons] == [
+        ("Location 10", "unsub:1"),
+        ("Work", "unsub:2"),
+    ]
+    assert context.user_data == {}
+
+
+@pytest.mark.parametrize(
+    ("success", "expected"),
+    [(True, "erfolgreich abbestellt"), (False, "Fehler")],
+)
+async def test_handle_unsubscribe_choice(context, success, expected):
+    """Tests that the pressed button unsubscribes within the user's own chat."""
+    update = MagicMock(spec=Update)
+    update.effective_chat = MagicMock(spec=_CHAT_SPEC)
+    update.effective_chat.id = CHAT_ID
+    update.callback_query = MagicMock(spec=_CALLBACK_QUERY_SPEC)
+    update.callback_query.data = "unsub:42"
+    update.callback_query.answer = AsyncMock()
+    update.callback_query.edit_message_text = AsyncMock()
+    context.facade.unsubscribe.return_value = success
+
+    await handle_unsubscribe_choice(update, context)
+
+    update.callback_query.answer.assert_awaited_once()
+    context.facade.unsubscribe.assert_called_once_with(42, CHAT_ID)
+    assert expected in update.callback_query.edit_message_text.call_args[0][0]
+
+
+async def test_handle_expired_menu_answers_the_button(context):
+    """Tests that a button of an ended conversation is answered and replaced."""
+    update = MagicMock(spec=Update)
+    update.callback_query = MagicMock(spec=_CALLBACK_QUERY_SPEC)
+    update.callback_query.data = "time:evening"
+    update.callback_query.answer = AsyncMock()
+    update.callback_query.edit_message_text = AsyncMock()
+
+    await handle_expired_menu(update, context)
+
+    update.callback_query.answer.assert_awaited_once()
+    assert "abgelaufen" in update.callback_query.edit_message_text.call_args[0][0]
+
+
+def test_stale_time_button_reaches_the_expired_menu_handler():
+    """Tests that a time button pressed outside the conversation is answered."""
+    application = Application.builder().token("123:ABC").build()
+    setup_handlers(application)
+    update = Update(
+        1,
+        callback_query=CallbackQuery(
+            "1",
+            User(USER_ID, USERNAME, False),
+            "instance",
+            data="time:evening",
+            message=Message(1, None, Chat(CHAT_ID, Chat.PRIVATE)),
+        ),
+    )
+
+    handlers = [
+        handler
+        for handler in application.handlers[0]
+        if handler.check_update(update) not in (None, False)
+    ]
+
+    assert handlers[0].callback is handle_expired_menu
+
+
+async def test_next_pickup_formats_each_pickup(update, context):
+    """Tests the /nextpickup message, including the default emoji fallback."""
+    context.facade.get_next_pickup_for_user.return_value = [
+        {"address": "Home", "event": {"waste_type": "Papier", "date": "2023-10-27"}},
+        {"address": "Work", "event": {"waste_type": "Sperrmüll", "date": "2023-10-30"}},
+    ]
+
+    await next_pickup(update, context)
+
+    message = update.message.reply_text.call_args[0][0]
+    assert message == (
+        "<b>Nächste Abholungen:</b>\n\n"
+        "📍 <b>Home</b>\n   🔵 Papier am 2023-10-27\n\n"
+        "📍 <b>Work</b>\n   🗑️ Sperrmüll am 2023-10-30\n\n"
+    )
+
+
+def test_setup_handlers_read_only_commands_do_not_block():
+    """Tests that only the read-only commands are registered as non-blocking."""
+    application = MagicMock()
+
+    setup_handlers(application)
+
+    handlers = [call.args[0] for call in application.add_handler.call_args_list]
+    blocking = {
+        next(iter(handler.commands)): bool(handler.block)
+        for handler in handlers
+        if isinstance(handler, CommandHandler)
+    }
+    assert blocking == {
+        "start": False,
+        "mysubscriptions": False,
+        "nextpickup": False,
+        "unsubscribe": True,
+    }
+    assert all(
+        handler.block for handler in handlers if isinstance(handler, ConversationHandler)
+    )
+
+
+async def test_enforce_chat_rate_limit_drops_bursts_per_chat(update, context, monkeypatch):
+    """
+    Tests that a chat exceeding its budget is stopped and told once, without
+    affecting other chats.
+    """
+    monkeypatch.setattr("telegram_bot.bot.TELEGRAM_RATE_LIMIT_PER_CHAT", 1)
+    update.effective_chat = MagicMock(spec=_CHAT_SPEC)
+    update.effective_chat.id = CHAT_ID
+    update.effective_message = update.message
+    context.chat_data = {}
+
+    await enforce_chat_rate_limit(update, context)
+    for _ in range(2):
+        with pytest.raises(ApplicationHandlerStop):
+            await enforce_chat_rate_limit(update, context)
+
+    update.message.reply_text.assert_awaited_once()
+    assert "nicht so schnell" in update.message.reply_text.call_args[0][0]
+
+    # Another chat has its own limiter
+    other_context = MagicMock(spec=_CONTEXT_SPEC)
+    other_context.chat_data = {}
+    await enforce_chat_rate_limit(update, other_context)
+
+
+def test_chat_rate_limit_applies_only_to_commands():
+    """Tests that conversation replies and button presses bypass the chat limit."""
+    application = MagicMock()
+
+    setup_handlers(application)
+
+    [limit_handler] = [
+        call.args[0]
+        for call in application.add_handler.call_args_list
+        if call.kwargs.get("group") == -1
+    ]
+    assert limit_handler.callback is enforce_chat_rate_limit
+    assert limit_handler.filters is filters.COMMAND
+
+
+@pytest.mark.parametrize("with_persistence", [False, True])
+def test_subscribe_conversation_is_persistent_only_with_persistence(tmp_path, with_persistence):
+    """Tests that the subscribe conversation is stored only if persistence is configured."""
+    builder = Application.builder().token("123456:TEST")
+    if with_persistence:
+        builder = builder.persistence(PicklePersistence(filepath=tmp_path / "state"))
+    application = builder.build()
+
+    setup_handlers(application)
+
+    conversations = [
+        handler
+        for handler in application.handlers[0]
+        if isinstance(handler, ConversationHandler)
+    ]
+    assert [c.persistent for c in conversations] == [with_persistence]
+
+
+async def test_rate_limiter_sends_to_group_chats():
+    """Tests that the default limiter lets messages to a group chat through."""
+    rate_limiter = build_rate_limiter()
+    await rate_limiter.initialize()
+    send = AsyncMock(return_value=True)
+
+    result = await rate_limiter.process_request(
+        callback=send,
+        args=(),
+        kwargs={},
+        endpoint="sendMessage",
+        data={"chat_id": -1001234567890, "text": "Hallo"},
+        rate_limit_args=None,
+    )
+
+    assert result is True
+    send.assert_awaited_once()
+    await rate_limiter.shutdown()
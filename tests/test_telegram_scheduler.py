@@ -2,11 +2,17 @@
 Tests for the Telegram bot's scheduler.
 """
 
-from unittest.mock import AsyncMock, MagicMock
+import asyncio
+import threading
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from telegram_bot.scheduler import check_and_send_notifications
+from schedule_parser.models import NotificationTask
+from telegram_bot.scheduler import (check_and_send_notifications,
+                                    next_notification_window,
+                                    next_scheduler_run, scheduler)
 
 
 @pytest.fixture
@@ -14,9 +20,9 @@ def mock_facade():
     """Returns a mock WasteManagementFacade."""
     facade = MagicMock()
     facade.get_due_notifications.return_value = []
-    facade.log_pending_notification.return_value = 1
-    facade.update_notification_log = MagicMock()
-    facade.update_last_notified_date = MagicMock()
+    facade.log_pending_notifications.side_effect = lambda ids: [
+        100 + i for i in range(len(ids))
+    ]
     return facade
 
 
@@ -28,34 +34,22 @@ def mock_bot():
     return bot
 
 
-@pytest.mark.asyncio
 async def test_check_and_send_notifications_no_notifications(mock_facade, mock_bot):
     """
     Tests that no notifications are sent when there are no due notifications.
     """
-    await check_and_send_notifications(mock_facade, mock_bot)
-    mock_facade.get_due_notifications.assert_called_once()
+    await check_and_send_notifications(mock_facade, mock_bot, "evening")
+    mock_facade.get_due_notifications.assert_called_once_with("evening")
     mock_bot.send_message.assert_not_called()
 
 
-@pytest.mark.asyncio
 async def test_check_and_send_notifications_sends_successfully(mock_facade, mock_bot):
     """
     Tests that notifications are sent successfully when there are due notifications.
     """
     notifications = [
-        {
-            "subscription_id": 1,
-            "chat_id": 123,
-            "message": "Test message 1",
-            "collection_date": "2025-10-24",
-        },
-        {
-            "subscription_id": 2,
-            "chat_id": 456,
-            "message": "Test message 2",
-            "collection_date": "2025-10-25",
-        },
+        NotificationTask(1, 123, "Test message 1", "2025-10-24"),
+        NotificationTask(2, 456, "Test message 2", "2025-10-25"),
     ]
     mock_facade.get_due_notifications.return_value = notifications
 
@@ -63,21 +57,21 @@ async def test_check_and_send_notifications_sends_successfully(mock_facade, mock
 
     assert mock_facade.get_due_notifications.call_count == 1
     assert mock_bot.send_message.call_count == 2
-    mock_facade.update_notification_log.assert_called()
+    mock_facade.log_pending_notifications.assert_called_once_with([1, 2])
+    mock_facade.finalize_notifications.assert_called_once()
+    outcomes = mock_facade.finalize_notifications.call_args.args[0]
+    assert sorted((o["log_id"], o["status"]) for o in outcomes) == [
+        (100, "success"),
+        (101, "success"),
+    ]
 
 
-@pytest.mark.asyncio
 async def test_check_and_send_notifications_handles_failure(mock_facade, mock_bot):
     """
     Tests that the scheduler handles failures when sending notifications.
     """
     notifications = [
-        {
-            "subscription_id": 1,
-            "chat_id": 123,
-            "message": "Test message 1",
-            "collection_date": "2025-10-24",
-        },
+        NotificationTask(1, 123, "Test message 1", "2025-10-24"),
     ]
     mock_facade.get_due_notifications.return_value = notifications
     mock_bot.send_message.side_effect = Exception("Test error")
@@ -86,4 +80,180 @@ async def test_check_and_send_notifications_handles_failure(mock_facade, mock_bo
 
     assert mock_facade.get_due_notifications.call_count == 1
     assert mock_bot.send_message.call_count == 1
-    mock_facade.update_notification_log.assert_called_with(1, "failure", "Test error")
+    outcomes = mock_facade.finalize_notifications.call_args.args[0]
+    assert outcomes == [
+        {
+            "log_id": 100,
+            "subscription_id": 1,
+            "collection_date": "2025-10-24",
+            "status": "failure",
+            "error_message": "Test error",
+        }
+    ]
+
+
+async def test_check_and_send_notifications_sends_without_chunk_sleeps(mock_facade, mock_bot):
+    """
+    Tests that more than one chunk's worth of notifications is sent without
+    sleeping between fixed-size chunks.
+    """
+    notifications = [
+        NotificationTask(i, 1000 + i, f"Test message {i}", "2025-10-24")
+        for i in range(20)
+    ]
+    mock_facade.get_due_notifications.return_value = notifications
+
+    with patch("telegram_bot.scheduler.asyncio.sleep") as mock_sleep:
+        await check_and_send_notifications(mock_facade, mock_bot)
+
+    mock_sleep.assert_not_called()
+    assert mock_bot.send_message.call_count == 20
+    mock_facade.log_pending_notifications.assert_called_once()
+    assert len(mock_facade.finalize_notifications.call_args.args[0]) == 20
+
+
+async def test_nothing_is_sent_when_pending_logs_fail(mock_facade, mock_bot):
+    """
+    Tests that no notification is sent if the pending logs could not be written.
+    """
+    mock_facade.get_due_notifications.return_value = [
+        NotificationTask(1, 1, "m", "2025-10-24"),
+    ]
+    mock_facade.log_pending_notifications.side_effect = None
+    mock_facade.log_pending_notifications.return_value = []
+
+    await check_and_send_notifications(mock_facade, mock_bot)
+
+    mock_bot.send_message.assert_not_called()
+    mock_facade.finalize_notifications.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "now, expected",
+    [
+        (datetime(2025, 10, 24, 5, 59, 30), (30, "morning")),
+        (datetime(2025, 10, 24, 6, 0), (13 * 3600, "evening")),
+        (datetime(2025, 10, 24, 6, 30), (12.5 * 3600, "evening")),
+        (datetime(2025, 10, 24, 20, 0), (10 * 3600, "morning")),
+        (datetime(2025, 10, 31, 23, 0), (7 * 3600, "morning")),
+    ],
+)
+def test_next_notification_window(now, expected):
+    """Tests that the scheduler wakes exactly when the next window opens."""
+    assert next_notification_window(now) == expected
+
+
+@pytest.mark.parametrize(
+    "now, expected",
+    [
+        (datetime(2025, 10, 24, 5, 59, 30), (30, "morning")),
+        (datetime(2025, 10, 24, 18, 0), (3600, "evening")),
+        (datetime(2025, 10, 24, 12, 0), (3600, None)),
+        (datetime(2025, 10, 24, 20, 0), (3600, None)),
+    ],
+)
+def test_next_scheduler_run(now, expected):
+    """Tests that catch-up passes run between windows that are far apart."""
+    assert next_scheduler_run(now) == expected
+
+
+async def test_scheduler_retries_failed_sends(mock_facade, mock_bot, monkeypatch):
+    """Tests that a failed send is retried by the next catch-up pass."""
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2025, 10, 24, 12, 0)
+
+    monkeypatch.setattr("telegram_bot.scheduler.datetime", FrozenDatetime)
+    # The subscription stays due until a send succeeds
+    mock_facade.get_due_notifications.return_value = [
+        NotificationTask(1, 123, "Test message", "2025-10-24"),
+    ]
+    mock_bot.send_message.side_effect = [Exception("Test error"), None]
+    application = MagicMock(bot=mock_bot)
+    sleep = AsyncMock(side_effect=[None, asyncio.CancelledError()])
+    monkeypatch.setattr("telegram_bot.scheduler.asyncio.sleep", sleep)
+
+    with pytest.raises(asyncio.CancelledError):
+        await scheduler(mock_facade, application)
+
+    assert [c.args for c in mock_facade.get_due_notifications.call_args_list] == [
+        (None,),
+        (None,),
+    ]
+    assert [c.args for c in sleep.call_args_list] == [(3600,), (3600,)]
+    statuses = [
+        o["status"]
+        for c in mock_facade.finalize_notifications.call_args_list
+        for o in c.args[0]
+    ]
+    assert statuses == ["failure", "success"]
+
+
+async def test_scheduler_catches_up_on_startup_then_checks_the_window(
+    mock_facade, mock_bot, monkeypatch
+):
+    """
+    Tests that the first pass checks all due notifications and that the
+    window's subscribers are checked when the window opens.
+    """
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2025, 10, 24, 18, 30)
+
+    monkeypatch.setattr("telegram_bot.scheduler.datetime", FrozenDatetime)
+    application = MagicMock(bot=mock_bot)
+    sleep = AsyncMock(side_effect=[None, asyncio.CancelledError()])
+    monkeypatch.setattr("telegram_bot.scheduler.asyncio.sleep", sleep)
+
+    with pytest.raises(asyncio.CancelledError):
+        await scheduler(mock_facade, application)
+
+    assert [c.args for c in mock_facade.get_due_notifications.call_args_list] == [
+        (None,),
+        ("evening",),
+    ]
+    assert [c.args for c in sleep.call_args_list] == [(1800,), (1800,)]
+
+
+async def test_database_calls_run_in_worker_threads(mock_facade, mock_bot):
+    """Tests that the facade is not called on the event loop's thread."""
+    loop_thread = threading.get_ident()
+    threads = []
+
+    def get_due_notifications(notification_time):
+        threads.append(threading.get_ident())
+        return [
+            NotificationTask(1, 1, "m", "2025-10-24"),
+        ]
+
+    mock_facade.get_due_notifications.side_effect = get_due_notifications
+    mock_facade.finalize_notifications.side_effect = lambda outcomes: threads.append(
+        threading.get_ident()
+    )
+
+    await check_and_send_notifications(mock_facade, mock_bot)
+
+    assert len(threads) == 2
+    assert loop_thread not in threads
+
+
+async def test_outcomes_are_recorded_in_batches(mock_facade, mock_bot):
+    """Tests that outcomes are written in batches while the sends continue."""
+    notifications = [
+        NotificationTask(i, 1000 + i, f"Test message {i}", "2025-10-24")
+        for i in range(120)
+    ]
+    mock_facade.get_due_notifications.return_value = notifications
+
+    with patch("telegram_bot.scheduler.NOTIFICATION_SEND_RATE", 1000):
+        await check_and_send_notifications(mock_facade, mock_bot)
+
+    batches = [c.args[0] for c in mock_facade.finalize_notifications.call_args_list]
+    assert [len(batch) for batch in batches] == [50, 50, 20]
+    assert sorted(o["log_id"] for batch in batches for o in batch) == list(
+        range(100, 220)
+    )
@@ -0,0 +1,26 @@
+"""
+Unit tests for the waste type emoji mapping.
+"""
+
+import pytest
+
+from schedule_parser.waste_types import DEFAULT_EMOJI, get_waste_type_emoji
+
+
+@pytest.mark.parametrize(
+    "waste_type, expected",
+    [
+        ("Bio-Tonne", "🟢"),
+        ("Papier-Tonne", "🔵"),
+        ("Gelbe Tonne", "🟡"),
+        ("Verpackung", "🟡"),
+        ("Rest-Tonne", "⚫"),
+        ("REST-TONNE", "⚫"),
+        ("Weihnachtsbaum-Tonne", DEFAULT_EMOJI),
+        ("Unbekannt", DEFAULT_EMOJI),
+        ("", DEFAULT_EMOJI),
+    ],
+)
+def test_get_waste_type_emoji(waste_type, expected):
+    """Tests that waste types are mapped by their prefix."""
+    assert get_waste_type_emoji(waste_type) == expected